@@ -2,87 +2,204 @@
 import json
 import sys
 from collections import defaultdict, deque
+from fractions import Fraction
+from math import gcd
 
+try:
+    import orjson  # Optional: much faster JSON I/O on large networks
+except ImportError:
+    orjson = None
 
-class MaxFlowSolver:
-    """Max-flow solver with support for lower bounds and node capacities."""
+
+def dinic_maxflow(head, nxt, to, cap, source, sink):
+    """Capacity-scaling Dinic max-flow kernel over forward-star edge arrays.
     
-    def __init__(self):
-        self.graph = defaultdict(lambda: defaultdict(float))
-        self.original_capacity = {}
-        self.nodes = set()
+    Works purely on integer node/edge ids so the whole augmenting loop stays
+    in one function with local-variable access. Capacities must be integers,
+    so all comparisons are exact. `cap` is updated in place to the final
+    residual capacities; returns the total flow pushed.
     
-    def add_edge(self, u, v, capacity):
-        """Add directed edge with capacity."""
-        self.graph[u][v] += capacity
-        self.original_capacity[(u, v)] = self.graph[u][v]
-        self.nodes.add(u)
-        self.nodes.add(v)
-        if v not in self.graph:
-            self.graph[v] = defaultdict(float)
-        if u not in self.graph:
-            self.graph[u] = defaultdict(float)
-    
-    def bfs(self, source, sink, parent):
-        """BFS to find augmenting path, returns True if path exists."""
-        visited = {source}
+    Phases run with a threshold delta (largest power of two <= max capacity,
+    halved each round), only using residual edges with cap >= delta, so
+    large capacities are routed in few augmentations before the small ones.
+    The last round (delta = 1) uses every edge with positive capacity.
+    """
+    n = len(head)
+    max_flow = 0
+    
+    max_cap = max(cap, default=0)
+    if max_cap < 1:
+        return max_flow
+    delta = 1
+    while delta * 2 <= max_cap:
+        delta *= 2
+    
+    # Levels are stamped with a per-phase base instead of being reset: a node
+    # is unvisited in the current phase iff level[v] < base, and base moves
+    # past every level used so far (depth < n) at the start of each phase
+    level = [-1] * n
+    base = -n
+    
+    while True:
+        # BFS: assign levels on residual edges with cap >= delta
+        base += n
+        level[source] = base
         queue = deque([source])
-        
         while queue:
-            # Sort for determinism
             u = queue.popleft()
-            
-            # Sort neighbors for determinism
-            neighbors = sorted(self.graph[u].keys())
-            for v in neighbors:
-                if v not in visited and self.graph[u][v] > 1e-9:
-                    visited.add(v)
-                    parent[v] = u
-                    if v == sink:
-                        return True
+            next_level = level[u] + 1
+            e = head[u]
+            while e != -1:
+                v = to[e]
+                if cap[e] >= delta and level[v] < base:
+                    level[v] = next_level
                     queue.append(v)
+                e = nxt[e]
         
-        return False
-    
-    def edmonds_karp(self, source, sink):
-        """Edmonds-Karp algorithm for max flow."""
-        parent = {}
-        max_flow = 0
+        if level[sink] < base:
+            if delta == 1:
+                return max_flow
+            delta //= 2
+            continue
         
-        while self.bfs(source, sink, parent):
-            # Find minimum capacity along the path
-            path_flow = float('inf')
-            s = sink
-            while s != source:
-                path_flow = min(path_flow, self.graph[parent[s]][s])
-                s = parent[s]
+        # Blocking flow: DFS with a current-arc pointer per node, so each
+        # saturated or dead-end edge is skipped at most once per phase
+        arcs = list(head)
+        path = []  # edge ids from source to u
+        u = source
+        while True:
+            if u == sink:
+                # Push the bottleneck capacity along the path
+                path_flow = min(cap[e] for e in path)
+                for e in path:
+                    cap[e] -= path_flow
+                    cap[e ^ 1] += path_flow
+                max_flow += path_flow
+                path = []
+                u = source
+                continue
             
-            # Update residual capacities
-            v = sink
-            while v != source:
-                u = parent[v]
-                self.graph[u][v] -= path_flow
-                self.graph[v][u] += path_flow
-                v = parent[v]
+            next_level = level[u] + 1
+            e = arcs[u]
+            while e != -1 and not (cap[e] >= delta and level[to[e]] == next_level):
+                e = nxt[e]
+            arcs[u] = e
             
-            max_flow += path_flow
-            parent = {}
+            if e != -1:
+                path.append(e)
+                u = to[e]
+            elif path:
+                # Dead end: retreat and drop the arc that led here
+                e = path.pop()
+                u = to[e ^ 1]
+                arcs[u] = nxt[e]
+            else:
+                break
+
+
+class MaxFlowSolver:
+    """Max-flow solver with support for lower bounds and node capacities.
+    
+    Nodes are integer ids 0..num_nodes-1. The residual graph is stored as
+    flat struct-of-arrays edge lists (forward-star layout): `head[u]` is the
+    first edge out of u, `nxt[e]` chains edges with the same tail, and
+    `to[e]` / `cap[e]` hold the head node and residual capacity. Every edge
+    e is paired with its reverse edge e ^ 1.
+    """
+    
+    def __init__(self, num_nodes):
+        self.head = [-1] * num_nodes
+        self.nxt = []
+        self.to = []
+        self.cap = []
+        self.orig_cap = []
+    
+    def add_edge(self, u, v, capacity):
+        """Add directed edge with capacity (and its zero-capacity reverse edge).
         
-        return max_flow
+        Returns the index of the forward edge.
+        """
+        # Forward edge e, reverse edge e ^ 1
+        e = len(self.to)
+        head = self.head
+        self.to += (v, u)
+        self.cap += (capacity, 0)
+        self.orig_cap += (capacity, 0)
+        self.nxt.append(head[u])
+        head[u] = e
+        self.nxt.append(head[v])  # after head[u] is updated, so a self-loop stays linked
+        head[v] = e + 1
+        
+        return e
+    
+    def saturated_cut_edges(self, reachable):
+        """Saturated original edges from the reachable set to the rest of the graph.
+        
+        `reachable` is the mask returned by get_reachable_from_source. Yields
+        (edge_index, original_capacity) pairs in node-id order. Reverse
+        (residual-only) edges have zero original capacity and are skipped.
+        """
+        nxt, to, cap, orig_cap = self.nxt, self.to, self.cap, self.orig_cap
+        
+        for u, e in enumerate(self.head):
+            if not reachable[u]:
+                continue
+            while e != -1:
+                if orig_cap[e] > 0 and not reachable[to[e]] and cap[e] <= 0:
+                    yield e, orig_cap[e]
+                e = nxt[e]
+    
+    def dinic(self, source, sink):
+        """Dinic's algorithm for max flow (level graph + blocking flows)."""
+        return dinic_maxflow(self.head, self.nxt, self.to, self.cap, source, sink)
     
     def get_reachable_from_source(self, source):
-        """Get all nodes reachable from source in residual graph."""
-        visited = {source}
-        queue = deque([source])
+        """Mask of nodes reachable from source in residual graph (bytearray by node id).
         
-        while queue:
-            u = queue.popleft()
-            for v in sorted(self.graph[u].keys()):
-                if v not in visited and self.graph[u][v] > 1e-9:
-                    visited.add(v)
-                    queue.append(v)
+        Only the reachable set matters, not distances, so this is an iterative
+        DFS on a plain list stack.
+        """
+        head, nxt, to, cap = self.head, self.nxt, self.to, self.cap
+        visited = bytearray(len(head))
+        visited[source] = 1
+        stack = [source]
+        
+        while stack:
+            u = stack.pop()
+            e = head[u]
+            while e != -1:
+                v = to[e]
+                if cap[e] > 0 and not visited[v]:
+                    visited[v] = 1
+                    stack.append(v)
+                e = nxt[e]
         
-        return sorted(visited)
+        return visited
+
+
+def exact_rate(value):
+    """Exact rational value of an input rate (integers stay plain ints).
+    
+    Floats are read through their shortest decimal repr, so 0.1 means 1/10.
+    """
+    if isinstance(value, float) and not value.is_integer():
+        return Fraction(str(value))
+    return int(value)
+
+
+def capacity_scale(values):
+    """Smallest integer factor that turns every value in `values` into an integer."""
+    scale = 1
+    for value in values:
+        denominator = exact_rate(value).denominator
+        if denominator != 1:
+            scale = scale * denominator // gcd(scale, denominator)
+    return scale
+
+
+def _r2(units, scale):
+    """Round units / scale to 2 decimals (half up) using exact integer arithmetic."""
+    return (units * 200 + scale) // (2 * scale) / 100
 
 
 def solve_belts(data):
@@ -93,9 +210,22 @@ def solve_belts(data):
     sources = data["sources"]
     sink = data["sink"]
     
+    # Work in exact integer units: every rate is multiplied by the LCM of
+    # the denominators of all input rates, and divided back out for output
+    scale = capacity_scale(
+        [edge["hi"] for edge in edges]
+        + [edge.get("lo", 0) for edge in edges]
+        + [s["supply"] for s in sources]
+        + list(node_caps.values())
+    )
+    
+    def to_units(value):
+        return int(exact_rate(value) * scale)
+    
     # Step 1: Node splitting for capacity constraints
-    # We'll track which nodes need splitting
-    split_nodes = {}
+    # Every node gets integer ids (in_id, out_id). Capped nodes (other than
+    # sources and sink) are split into two consecutive ids joined by an edge
+    # of capacity cap[v]; all other nodes use one id for both halves.
     all_nodes = set([sink])
     
     for edge in edges:
@@ -105,33 +235,46 @@ def solve_belts(data):
     for source_info in sources:
         all_nodes.add(source_info["node"])
     
-    # Identify nodes that need splitting (have caps, not source/sink)
     source_nodes = {s["node"] for s in sources}
-    for node in all_nodes:
+    
+    # Reverse map id -> name, used only for reporting cut_reachable
+    node_names = []
+    in_id = {}
+    out_id = {}
+    split_nodes = []
+    
+    for node in sorted(all_nodes):
         if node in node_caps and node != sink and node not in source_nodes:
-            split_nodes[node] = f"{node}_out"
+            split_nodes.append(node)
+            in_id[node] = len(node_names)
+            out_id[node] = len(node_names) + 1
+            node_names.extend((f"{node}_in", f"{node}_out"))
+        else:
+            in_id[node] = out_id[node] = len(node_names)
+            node_names.append(node)
+    
+    # Auxiliary terminals for the circulation and the main flow
+    dummy_source = len(node_names)
+    dummy_sink = dummy_source + 1
+    virtual_source = dummy_source + 2
+    node_names.extend(("__dummy_source__", "__dummy_sink__", "__virtual_source__"))
+    
+    sink_id = in_id[sink]
     
     # Step 2: Handle lower bounds via circulation problem
     # Transform edges: reduce capacity by lo, track imbalances
     transformed_edges = []
-    imbalance = defaultdict(float)
-    edge_mapping = {}  # Map (u_actual, v_actual) -> original edge info
+    edge_lo = []  # Lower bound of each original edge, in input order
+    imbalance = defaultdict(int)
     
     for edge in edges:
         u, v = edge["from"], edge["to"]
-        lo = edge.get("lo", 0)
-        hi = edge["hi"]
+        lo = to_units(edge.get("lo", 0))
+        hi = to_units(edge["hi"])
         
-        # Apply node splitting if needed
-        if u in split_nodes:
-            u_actual = split_nodes[u]
-        else:
-            u_actual = u
-        
-        if v in split_nodes:
-            v_actual = f"{v}_in"
-        else:
-            v_actual = v
+        # Apply node splitting: leave from u's out half, enter v's in half
+        u_actual = out_id[u]
+        v_actual = in_id[v]
         
         # Transform for lower bounds
         transformed_edges.append({
@@ -140,15 +283,7 @@ def solve_belts(data):
             "capacity": hi - lo,
             "original_lo": lo
         })
-        
-        # Store mapping for flow reconstruction
-        edge_mapping[(u_actual, v_actual)] = {
-            "original_from": u,
-            "original_to": v,
-            "lo": lo,
-            "hi": hi,
-            "transformed_capacity": hi - lo
-        }
+        edge_lo.append(lo)
         
         # Track imbalances due to lower bounds
         imbalance[v_actual] += lo  # v needs lo more (demand)
@@ -156,204 +291,186 @@ def solve_belts(data):
     
     # Add edges for split nodes
     split_edges = []
-    for node, out_node in split_nodes.items():
-        in_node = f"{node}_in"
-        cap = node_caps[node]
+    for node in split_nodes:
         split_edges.append({
-            "from": in_node,
-            "to": out_node,
-            "capacity": cap,
-            "original_lo": 0
+            "from": in_id[node],
+            "to": out_id[node],
+            "capacity": to_units(node_caps[node]),
+            "original_lo": 0,
+            "node": node
         })
     
-    # Step 3: Check lower bound feasibility using dummy edges
-    # Add dummy edges to balance imbalances and check if a circulation exists
-    # Note: We exclude source nodes and sink from this check, as their imbalances
-    # are handled by the actual flow from sources to sink
+    solver = MaxFlowSolver(len(node_names))
     
-    source_nodes = {s["node"] for s in sources}
-    total_dummy_demand = 0
-    
-    # Filter out imbalances for source nodes and sink
-    internal_imbalance = {
-        node: imb for node, imb in imbalance.items()
-        if node not in source_nodes and node != sink
-    }
+    # Add all transformed edges first, so original edge i is solver edge 2 * i
+    for edge in transformed_edges:
+        solver.add_edge(edge["from"], edge["to"], edge["capacity"])
+    for edge in split_edges:
+        edge["edge_index"] = solver.add_edge(edge["from"], edge["to"], edge["capacity"])
     
-    # Only do feasibility check if there are actual internal imbalances
-    if any(abs(imb) > 1e-9 for imb in internal_imbalance.values()):
-        dummy_source = "__dummy_source__"
-        dummy_sink = "__dummy_sink__"
+    if any(edge_lo):
+        # Step 3: Close the network into a single circulation
+        # Every source must ship its whole supply: model virtual_source -> source
+        # arcs with lo = hi = supply (zero transformed capacity, so they only add
+        # imbalance) and return the flow through a sink -> virtual_source arc
+        total_supply = 0
+        for source_info in sources:
+            supply = to_units(source_info["supply"])
+            imbalance[in_id[source_info["node"]]] += supply
+            total_supply += supply
+        imbalance[virtual_source] -= total_supply
+        solver.add_edge(sink_id, virtual_source, total_supply)
         
-        # Create solver for feasibility check
-        solver_feasibility = MaxFlowSolver()
-        
-        # Add all transformed edges
-        for edge in transformed_edges + split_edges:
-            solver_feasibility.add_edge(edge["from"], edge["to"], edge["capacity"])
-        
-        # Add dummy edges to balance internal imbalances only
-        for node in sorted(internal_imbalance.keys()):
-            imb = internal_imbalance[node]
-            if imb > 1e-9:  # Positive imbalance (demand) - node needs flow
+        # Balance all imbalances (lower bounds and supplies) with dummy edges
+        required_flow = 0
+        for node in sorted(imbalance.keys()):
+            imb = imbalance[node]
+            if imb > 0:  # Positive imbalance (demand) - node needs flow
                 # Add edge FROM dummy_source TO node with capacity = imbalance
-                solver_feasibility.add_edge(dummy_source, node, imb)
-                total_dummy_demand += imb
-            elif imb < -1e-9:  # Negative imbalance (supply) - node has excess flow
+                solver.add_edge(dummy_source, node, imb)
+                required_flow += imb
+            elif imb < 0:  # Negative imbalance (supply) - node has excess flow
                 # Add edge FROM node TO dummy_sink with capacity = abs(imbalance)
-                solver_feasibility.add_edge(node, dummy_sink, -imb)
-        
-        # Run max flow from dummy_source to dummy_sink
-        max_flow_circulation = solver_feasibility.edmonds_karp(dummy_source, dummy_sink)
-        
-        # Check if all dummy edges are saturated (lower bounds feasible)
-        if abs(max_flow_circulation - total_dummy_demand) > 1e-6:
-            # Lower bounds not feasible - some dummy edges couldn't be saturated
-            reachable = solver_feasibility.get_reachable_from_source(dummy_source)
-            return {
-                "status": "infeasible",
-                "cut_reachable": [n for n in reachable if n not in [dummy_source, dummy_sink]],
-                "deficit": {
-                    "demand_balance": round(total_dummy_demand - max_flow_circulation, 2),
-                    "tight_nodes": [],
-                    "tight_edges": []
-                }
-            }
-    
-    # Step 4: Run actual flow from virtual_source to sink
-    # Create solver for the main flow problem
-    solver2 = MaxFlowSolver()
-    
-    # Add all transformed edges
-    for edge in transformed_edges + split_edges:
-        solver2.add_edge(edge["from"], edge["to"], edge["capacity"])
-    
-    # Calculate total supply, accounting for lower bounds on source edges
-    # For each source, reduce its available supply by the sum of lower bounds on its outgoing edges
-    adjusted_supply = {}
-    for source_info in sources:
-        source_node = source_info["node"]
-        supply = source_info["supply"]
+                solver.add_edge(node, dummy_sink, -imb)
         
-        # Find lower bounds on outgoing edges from this source
-        total_lo_from_source = sum(
-            edge["lo"] for edge in edges if edge["from"] == source_node
-        )
+        flow_source, flow_sink = dummy_source, dummy_sink
+    else:
+        # Step 3 (no lower bounds): the circulation reduces to a plain flow
+        # from virtual_source through supply-capped source arcs to the sink
+        required_flow = 0
+        for source_info in sources:
+            supply = to_units(source_info["supply"])
+            solver.add_edge(virtual_source, in_id[source_info["node"]], supply)
+            required_flow += supply
         
-        # Adjusted supply = original supply - lower bounds (which are "pre-sent")
-        adjusted_supply[source_node] = supply - total_lo_from_source
+        flow_source, flow_sink = virtual_source, sink_id
     
-    # Total supply for comparison (original, not adjusted)
-    total_supply = sum(s["supply"] for s in sources)
-    # Total adjusted supply (what we actually route through the transformed network)
-    total_adjusted_supply = sum(adjusted_supply.values())
+    # Step 4: One max flow decides both lower-bound feasibility and whether
+    # all supply reaches the sink: every edge leaving flow_source must be saturated
+    max_flow = solver.dinic(flow_source, flow_sink)
     
-    # Create virtual source and connect to actual sources with adjusted supply
-    virtual_source = "__virtual_source__"
-    for source_info in sources:
-        source_node = source_info["node"]
-        solver2.add_edge(virtual_source, source_node, adjusted_supply[source_node])
-    
-    # Run max flow
-    max_flow = solver2.edmonds_karp(virtual_source, sink)
-    
-    # Check if we can satisfy the demand (compare with adjusted supply)
-    if abs(max_flow - total_adjusted_supply) > 1e-6:
+    if max_flow != required_flow:
         # Infeasible
-        reachable = solver2.get_reachable_from_source(virtual_source)
+        reachable = solver.get_reachable_from_source(flow_source)
         
         # Find tight edges and nodes
         tight_edges = []
         tight_nodes = []
         
-        for node in reachable:
-            if node in node_caps:
-                # Check if node cap is tight
-                in_node = f"{node}_in"
-                out_node = split_nodes.get(node, node)
-                if in_node in solver2.graph and out_node in solver2.graph[in_node]:
-                    if solver2.graph[in_node][out_node] < 1e-9:
-                        tight_nodes.append(node)
+        # A node cap is tight when its in half is reachable and the split edge is saturated
+        for edge in split_edges:
+            if reachable[edge["from"]] and solver.cap[edge["edge_index"]] <= 0:
+                tight_nodes.append(edge["node"])
         
-        # Find edges crossing the cut
-        for u in reachable:
-            if u == virtual_source:
-                continue
-            for v in solver2.nodes:
-                if v not in reachable and (u, v) in solver2.original_capacity:
-                    if solver2.graph[u][v] < 1e-9:
-                        # Find original edge
-                        for edge in edges:
-                            u_orig = edge["from"]
-                            v_orig = edge["to"]
-                            if (u == u_orig or u == split_nodes.get(u_orig)) and \
-                               (v == v_orig or v == f"{v_orig}_in"):
-                                tight_edges.append({
-                                    "from": edge["from"],
-                                    "to": edge["to"],
-                                    "flow_needed": round(solver2.original_capacity[(u, v)], 2)
-                                })
+        # Find saturated edges crossing the cut; original edge i is solver
+        # edge 2 * i, so indices map straight back. Only the first two are reported
+        original_edge_slots = 2 * len(edges)
+        for e, capacity in solver.saturated_cut_edges(reachable):
+            if e >= original_edge_slots:
+                continue  # auxiliary or node-split edge
+            edge = edges[e >> 1]
+            tight_edges.append({
+                "from": edge["from"],
+                "to": edge["to"],
+                "flow_needed": _r2(capacity, scale)
+            })
+            if len(tight_edges) == 2:
+                break
         
         return {
             "status": "infeasible",
-            "cut_reachable": [n for n in reachable if n != virtual_source],
+            "cut_reachable": sorted(
+                node_names[n] for n in range(dummy_source) if reachable[n]
+            ),
             "deficit": {
-                "demand_balance": round(total_adjusted_supply - max_flow, 2),
+                "demand_balance": _r2(required_flow - max_flow, scale),
                 "tight_nodes": tight_nodes[:2] if tight_nodes else [],
                 "tight_edges": tight_edges[:2] if tight_edges else []
             }
         }
     
     # Step 7: Reconstruct original flows
+    # Flow sent = transformed capacity - residual capacity; adding back the
+    # lower bound gives the actual flow. The forward edges of the original
+    # edges sit at even indices, so read them off as aligned slices
+    forward = slice(0, 2 * len(edges), 2)
+    actual_flows = [
+        transformed_cap - residual + lo
+        for transformed_cap, residual, lo in zip(
+            solver.orig_cap[forward], solver.cap[forward], edge_lo
+        )
+    ]
+    
     flows = []
+    flow_to_sink = 0
     
-    for (u_actual, v_actual), edge_info in edge_mapping.items():
-        # Get original edge information
-        u_orig = edge_info["original_from"]
-        v_orig = edge_info["original_to"]
-        lo = edge_info["lo"]
-        transformed_cap = edge_info["transformed_capacity"]
-        
-        # Get current residual capacity from the solved graph
-        residual = solver2.graph[u_actual].get(v_actual, 0)
-        
-        # Flow sent = original transformed capacity - residual capacity
-        flow_sent = transformed_cap - residual
-        
-        # Add back lower bound to get actual flow
-        actual_flow = flow_sent + lo
-        
-        if actual_flow > 1e-9:
+    for edge, actual_flow in zip(edges, actual_flows):
+        if actual_flow > 0:
             flows.append({
-                "from": u_orig,
-                "to": v_orig,
-                "flow": round(actual_flow, 2)
+                "from": edge["from"],
+                "to": edge["to"],
+                "flow": _r2(actual_flow, scale)
             })
+            if edge["to"] == sink:
+                flow_to_sink += actual_flow
     
     # Sort flows for determinism
     flows.sort(key=lambda x: (x["from"], x["to"]))
     
-    # Calculate actual flow reaching the sink (sum of flows into sink)
-    actual_flow_to_sink = sum(
-        flow["flow"] for flow in flows if flow["to"] == sink
-    )
-    
     return {
         "status": "ok",
-        "max_flow_per_min": round(actual_flow_to_sink, 2),
+        "max_flow_per_min": _r2(flow_to_sink, scale),
         "flows": flows
     }
 
 
+def solve(data):
+    """Solve one belts problem given as a parsed JSON dict; returns the output dict."""
+    return solve_belts(data)
+
+
+def serve():
+    """Answer one JSON problem per stdin line with one JSON result line.
+    
+    Replies are compact JSON with sorted keys. A line that can't be parsed
+    or solved gets {"error": ..., "status": "error"} and the loop carries on.
+    """
+    loads = orjson.loads if orjson is not None else json.loads
+    for line in sys.stdin.buffer:
+        if not line.strip():
+            continue
+        try:
+            result = solve(loads(line))
+        except Exception as e:
+            result = {"error": repr(e), "status": "error"}
+        if orjson is not None:
+            out = orjson.dumps(result, option=orjson.OPT_SORT_KEYS)
+        else:
+            out = json.dumps(result, sort_keys=True, separators=(",", ":")).encode()
+        sys.stdout.buffer.write(out + b"\n")
+        sys.stdout.buffer.flush()
+
+
 def main():
+    # Long-running mode: one request per line until stdin closes
+    if "--server" in sys.argv[1:]:
+        serve()
+        return
+    
     # Read JSON from stdin
-    data = json.load(sys.stdin)
+    if orjson is not None:
+        data = orjson.loads(sys.stdin.buffer.read())
+    else:
+        data = json.load(sys.stdin)
     
     # Solve
-    result = solve_belts(data)
+    result = solve(data)
     
     # Write JSON to stdout
-    json.dump(result, sys.stdout, sort_keys=True)
+    if orjson is not None:
+        sys.stdout.buffer.write(orjson.dumps(result, option=orjson.OPT_SORT_KEYS))
+    else:
+        json.dump(result, sys.stdout, sort_keys=True)
 
 
 if __name__ == "__main__":
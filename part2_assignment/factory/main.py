@@ -1,9 +1,116 @@
 #!/usr/bin/env python3
 import json
+import os
 import sys
 import math
-from collections import defaultdict, deque
-from pulp import LpProblem, LpMinimize, LpVariable, LpStatus, PULP_CBC_CMD
+from collections import OrderedDict, defaultdict
+from pulp import LpProblem, LpMinimize, LpMaximize, LpVariable, LpStatus, PULP_CBC_CMD, lpSum, value
+
+try:
+    from pulp import HiGHS  # In-process HiGHS via highspy (PuLP >= 2.7)
+except ImportError:
+    HiGHS = None
+
+try:
+    import orjson  # Optional fast JSON parsing
+except ImportError:
+    orjson = None
+
+
+def _propagate(target_rate, num_items, step_items, step_recipes, step_out_per_craft,
+               in_offsets, in_items, in_qtys):
+    """Backward demand propagation kernel over flat, integer-indexed lists.
+    
+    Items are ids 0..num_items-1 in topological order with the target at 0.
+    Step k sizes recipe step_recipes[k] from the demand on item step_items[k]
+    (output per craft step_out_per_craft[k]); recipe r's inputs are
+    in_items / in_qtys[in_offsets[r]:in_offsets[r + 1]]. Each recipe is sized
+    at most once. Returns (demand, crafts); crafts[r] is 0.0 for unused recipes.
+    """
+    demand = [0.0] * num_items
+    demand[0] = target_rate
+    crafts = [0.0] * (len(in_offsets) - 1)
+    
+    for item, r, per_craft in zip(step_items, step_recipes, step_out_per_craft):
+        if crafts[r] > 0.0:
+            continue
+        d = demand[item]
+        if d <= 1e-9:
+            continue
+        
+        c = d / per_craft
+        crafts[r] = c
+        for j in range(in_offsets[r], in_offsets[r + 1]):
+            demand[in_items[j]] += c * in_qtys[j]
+    
+    return demand, crafts
+
+
+def make_highs_solver():
+    """In-process HiGHS LP solver (through highspy), or None if unavailable.
+    
+    HiGHS solves inside this process, avoiding the CBC subprocess launch and
+    LP-file round trip on every solve.
+    """
+    if HiGHS is None:
+        return None
+    solver = HiGHS(msg=False, timeLimit=2, threads=1)
+    return solver if solver.available() else None
+
+
+def make_cbc_solver():
+    """CBC LP solver with deterministic settings.
+    
+    CBC runs with presolve on and no extra options: the LP optimum does not
+    depend on the seed. Set FACTORY_CBC_SEED to pass `randomS <seed>` when
+    reproducible tie-breaking between equal-cost optima is needed.
+    """
+    seed = os.environ.get("FACTORY_CBC_SEED")
+    return PULP_CBC_CMD(
+        msg=0,  # Suppress output
+        timeLimit=2,  # 2 second timeout
+        threads=1,  # Single thread for determinism
+        presolve=True,
+        options=['randomS', seed] if seed else None  # Optional fixed seed
+    )
+
+
+def make_lp_solver():
+    """LP solver for the factory model: CBC, or HiGHS when FACTORY_LP_BACKEND=highs.
+    
+    Both are run single-threaded with a 2 second limit so results are
+    deterministic. CBC stays the default even when highspy is installed:
+    on LPs with tied optima the two solvers can return different vertices,
+    and the answer must not depend on what happens to be importable.
+    HiGHS falls back to CBC when highspy is missing.
+    """
+    if os.environ.get("FACTORY_LP_BACKEND") == "highs":
+        solver = make_highs_solver()
+        if solver is not None:
+            return solver
+    return make_cbc_solver()
+
+
+def scipy_linprog():
+    """(linprog, csr_matrix) from SciPy when FACTORY_LP_BACKEND=scipy, else None.
+    
+    The SciPy path builds the LP as a sparse matrix and solves it with
+    linprog(method="highs"), skipping PuLP's expression objects. It is opt-in
+    and falls back to PuLP when SciPy is not installed.
+    """
+    if os.environ.get("FACTORY_LP_BACKEND") != "scipy":
+        return None
+    return load_scipy_linprog()
+
+
+def load_scipy_linprog():
+    """(linprog, csr_matrix) from SciPy, or None if SciPy is not installed."""
+    try:
+        from scipy.optimize import linprog
+        from scipy.sparse import csr_matrix
+    except ImportError:
+        return None
+    return linprog, csr_matrix
 
 
 def solve_factory(data):
@@ -62,105 +169,113 @@ def solve_factory(data):
     raw_items = {item for item in all_items if item not in item_from_recipes}
     
     # Backward propagation: start from target, calculate required rates
-    # We'll try to find integer machine counts
+    # The producer choice and the item order do not depend on the target rate,
+    # so they are fixed once here and reused by every bisection step
+    
+    # Each produced item uses the first recipe that produces it
+    chosen_producer = {item: names[0] for item, names in item_from_recipes.items()}
+    
+    # Output per craft of the chosen producer, and its inputs as (item, qty) pairs
+    out_per_craft = {
+        item: recipes[name]["out"][item] * get_prod_mult(recipes[name])
+        for item, name in chosen_producer.items()
+    }
+    recipe_inputs = {
+        name: tuple(recipe.get("in", {}).items()) for name, recipe in recipes.items()
+    }
+    
+    def producer_inputs(item):
+        if item in raw_items or item not in chosen_producer:
+            return ()
+        return [in_item for in_item, _ in recipe_inputs[chosen_producer[item]]]
+    
+    # Topological order of the items reachable from the target: reverse
+    # postorder of a DFS over item -> producer-input edges, so every item comes
+    # after all items whose producers consume it (cycle back edges are ignored)
+    postorder = []
+    seen = {target_item}
+    stack = [(target_item, iter(producer_inputs(target_item)))]
+    while stack:
+        item, children = stack[-1]
+        for child in children:
+            if child not in seen:
+                seen.add(child)
+                stack.append((child, iter(producer_inputs(child))))
+                break
+        else:
+            stack.pop()
+            postorder.append(item)
+    demand_order = postorder[::-1]
+    
+    # Flatten the pass for _propagate: items are ids by position in
+    # demand_order (target first), recipes get ids in first-use order, and
+    # recipe inputs are stored CSR-style (offsets into flat item/qty lists)
+    item_idx = {item: k for k, item in enumerate(demand_order)}
+    recipe_names = []
+    recipe_idx = {}
+    step_items, step_recipes, step_out_per_craft = [], [], []
+    in_offsets, in_items, in_qtys = [0], [], []
+    for k, item in enumerate(demand_order):
+        recipe_name = chosen_producer.get(item)
+        if recipe_name is None or item in raw_items:
+            continue
+        if recipe_name not in recipe_idx:
+            recipe_idx[recipe_name] = len(recipe_names)
+            recipe_names.append(recipe_name)
+            for in_item, in_qty in recipe_inputs[recipe_name]:
+                in_items.append(item_idx[in_item])
+                in_qtys.append(in_qty)
+            in_offsets.append(len(in_items))
+        step_items.append(k)
+        step_recipes.append(recipe_idx[recipe_name])
+        step_out_per_craft.append(out_per_craft[item])
+    
+    # Feasibility-check tables aligned with the kernel's ids: each recipe's
+    # machine id and effective speed, per-machine caps (missing = unlimited),
+    # and the reachable raw items with their supply caps (missing = none)
+    machine_names = sorted({recipes[name]["machine"] for name in recipe_names})
+    machine_id = {name: m for m, name in enumerate(machine_names)}
+    recipe_machine = [machine_id[recipes[name]["machine"]] for name in recipe_names]
+    recipe_eff = [get_eff_crafts_per_min(recipes[name]) for name in recipe_names]
+    machine_caps = [max_machines.get(name, float('inf')) for name in machine_names]
+    raw_names = sorted(item for item in raw_items if item in item_idx)
+    raw_ids = [item_idx[item] for item in raw_names]
+    raw_caps = [raw_supply.get(item, 0.0) + 1e-9 for item in raw_names]
     
     def try_solve_with_target(target_rate_scaled):
         """Try to solve for a given target rate, returning machine counts if feasible."""
         
-        # item_demand[item] = total demand rate for that item
-        item_demand = defaultdict(float)
-        item_demand[target_item] = target_rate_scaled
+        # Single pass in topological order: each item's demand is complete
+        # before its producer is sized and the demand pushed to its inputs
+        demand, crafts = _propagate(
+            target_rate_scaled, len(demand_order), step_items, step_recipes,
+            step_out_per_craft, in_offsets, in_items, in_qtys
+        )
         
         # recipe_crafts[recipe_name] = crafts per minute for that recipe
-        recipe_crafts = defaultdict(float)
-        
-        # Backward traversal through graph: item -> recipe (machine) -> input_items
-        # Start from target item and propagate demand backward through machines
-        visited_items = set()
-        visited_recipes = set()
-        queue = deque([('item', target_item)])
-        
-        while queue:
-            node_type, node_id = queue.popleft()
-            
-            if node_type == 'item':
-                if node_id in visited_items or node_id in raw_items:
-                    continue
-                visited_items.add(node_id)
-                
-                # Get demand for this item
-                demand = item_demand[node_id]
-                if demand <= 1e-9:
-                    continue
-                
-                # Traverse edge: item <- recipe (find recipes that produce this item)
-                producing_recipes = item_from_recipes.get(node_id, [])
-                if not producing_recipes:
-                    continue
-                
-                # Use first recipe that produces this item
-                recipe_name = producing_recipes[0]
-                
-                # Add recipe node to queue for processing
-                queue.append(('recipe', recipe_name))
-                
-            elif node_type == 'recipe':
-                recipe_name = node_id
-                if recipe_name in visited_recipes:
-                    continue
-                visited_recipes.add(recipe_name)
-                
-                recipe = recipes[recipe_name]
-                
-                # At machine node: do calculations
-                # Find which output item triggered this recipe
-                output_item = None
-                for out_item in recipe.get("out", {}):
-                    if item_demand[out_item] > 1e-9:
-                        output_item = out_item
-                        break
-                
-                if not output_item:
-                    continue
-                
-                demand = item_demand[output_item]
-                out_qty = recipe["out"][output_item]
-                prod_mult = get_prod_mult(recipe)
-                effective_output_per_craft = out_qty * prod_mult
-                
-                # Calculate crafts needed at this machine
-                crafts_needed = demand / effective_output_per_craft
-                recipe_crafts[recipe_name] += crafts_needed
-                
-                # Traverse edges: recipe -> input_items (propagate demand)
-                for in_item, in_qty in recipe.get("in", {}).items():
-                    item_demand[in_item] += crafts_needed * in_qty
-                    # Add input item to queue
-                    queue.append(('item', in_item))
+        recipe_crafts = {
+            name: c for name, c in zip(recipe_names, crafts) if c > 0.0
+        }
         
         # Calculate machine counts (keep as decimals)
-        machine_counts = defaultdict(float)
-        for recipe_name, crafts in recipe_crafts.items():
-            recipe = recipes[recipe_name]
-            machine_type = recipe["machine"]
-            eff_crafts = get_eff_crafts_per_min(recipe)
-            machines_needed = crafts / eff_crafts
-            machine_counts[machine_type] += machines_needed
+        machine_counts = [0.0] * len(machine_names)
+        for r, c in enumerate(crafts):
+            if c > 0.0:
+                machine_counts[recipe_machine[r]] += c / recipe_eff[r]
         
-        # Check constraints
+        # Check constraints as whole-list comparisons against the aligned caps
         # 1. Machine limits
-        for machine_type, count in machine_counts.items():
-            if count > max_machines.get(machine_type, float('inf')):
-                return None  # Exceeds machine limit
+        if any(count > cap for count, cap in zip(machine_counts, machine_caps)):
+            return None  # Exceeds machine limit
         
         # 2. Raw material limits
-        raw_consumption = {}
-        for item in raw_items:
-            consumption = item_demand.get(item, 0.0)
-            if consumption > 1e-9:
-                if consumption > raw_supply.get(item, 0.0) + 1e-9:
-                    return None  # Exceeds raw supply
-                raw_consumption[item] = consumption
+        raw_demand = [demand[k] for k in raw_ids]
+        if any(d > 1e-9 and d > cap for d, cap in zip(raw_demand, raw_caps)):
+            return None  # Exceeds raw supply
+        
+        raw_consumption = {
+            item: d for item, d in zip(raw_names, raw_demand) if d > 1e-9
+        }
         
         # Calculate effective output rates (crafts * productivity multiplier)
         effective_output = {}
@@ -173,7 +288,9 @@ def solve_factory(data):
         return {
             "status": "ok",
             "per_recipe_crafts_per_min": dict(effective_output),
-            "per_machine_counts": dict(machine_counts),
+            "per_machine_counts": {
+                name: count for name, count in zip(machine_names, machine_counts) if count > 0.0
+            },
             "raw_consumption_per_min": raw_consumption
         }
     
@@ -187,7 +304,12 @@ def solve_factory(data):
     low, high = 0.0, target_rate
     max_feasible = 0.0
     
-    for _ in range(50):
+    # Relative tolerance (never finer than 0.01), and just enough halvings
+    # of [0, target_rate] to reach it
+    tol = max(0.01, target_rate * 1e-4)
+    max_iters = max(1, math.ceil(math.log2(max(target_rate, 1.0) / tol)))
+    
+    for _ in range(max_iters):
         mid = (low + high) / 2
         test_result = try_solve_with_target(mid)
         
@@ -197,7 +319,7 @@ def solve_factory(data):
         else:
             high = mid
         
-        if high - low < 0.01:
+        if high - low < tol:
             break
     
     # Identify bottlenecks
@@ -217,8 +339,26 @@ def solve_factory(data):
     }
 
 
-def solve_factory_simplex(data):
-    """Solve factory optimization using Linear Programming (Simplex method via PuLP)."""
+def lp_backend_name():
+    """Name of the LP backend solve() uses here: "scipy", "highs" or "cbc".
+    
+    Resolves FACTORY_LP_BACKEND against what is installed, with the same
+    fallbacks as scipy_linprog() and make_lp_solver().
+    """
+    if scipy_linprog() is not None:
+        return "scipy"
+    if os.environ.get("FACTORY_LP_BACKEND") == "highs" and make_highs_solver() is not None:
+        return "highs"
+    return "cbc"
+
+
+def solve_factory_simplex(data, lp_solver=None, scipy_api=None):
+    """Solve factory optimization using Linear Programming (Simplex method via PuLP).
+    
+    lp_solver and scipy_api let a caller reuse a make_lp_solver() instance and
+    a resolved scipy_linprog() across problems; by default both are created
+    per call.
+    """
     
     machines = data["machines"]
     recipes = data["recipes"]
@@ -245,16 +385,18 @@ def solve_factory_simplex(data):
         module = modules.get(machine_type, {})
         return 1 + module.get("prod", 0)
     
+    # Recipe inputs/outputs as tuples of (item, qty) pairs, materialized once
+    recipe_in = {name: tuple(recipe.get("in", {}).items()) for name, recipe in recipes.items()}
+    recipe_out = {name: tuple(recipe.get("out", {}).items()) for name, recipe in recipes.items()}
+    
     # Identify all items
-    all_items = set()
     produced_items = set()
     consumed_items = set()
     
-    for recipe in recipes.values():
-        all_items.update(recipe.get("in", {}).keys())
-        all_items.update(recipe.get("out", {}).keys())
-        produced_items.update(recipe.get("out", {}).keys())
-        consumed_items.update(recipe.get("in", {}).keys())
+    for recipe_name in recipes:
+        produced_items.update(item for item, _ in recipe_out[recipe_name])
+        consumed_items.update(item for item, _ in recipe_in[recipe_name])
+    all_items = produced_items | consumed_items
     
     # Classify items:
     # - Raw items: not produced by any recipe
@@ -265,52 +407,77 @@ def solve_factory_simplex(data):
                        if item not in consumed_items and item != target_item}
     intermediate_items = (produced_items & consumed_items) - {target_item}
     
-    def try_solve_lp(target_rate_scaled):
-        """Try to solve using LP for a given target rate."""
+    # Sorted name lists (for determinism), computed once and shared by the
+    # LP builds and the result extraction
+    sorted_recipe_names = sorted(recipes.keys())
+    sorted_machine_names = sorted(machines.keys())
+    sorted_all_items = sorted(all_items)
+    sorted_raw_items = sorted(raw_items)
+    sorted_byproduct_items = sorted(byproduct_items)
+    
+    # Per-recipe scalars are fixed for the whole solve (including bisection),
+    # so compute them once instead of inside every constraint loop
+    eff_crafts = {name: get_eff_crafts_per_min(recipe) for name, recipe in recipes.items()}
+    inv_eff = {name: 1.0 / eff for name, eff in eff_crafts.items()}
+    prod_mult = {name: get_prod_mult(recipe) for name, recipe in recipes.items()}
+    recipes_by_machine = defaultdict(list)  # machine -> [recipe_name], sorted
+    for recipe_name in sorted_recipe_names:
+        recipes_by_machine[recipes[recipe_name]["machine"]].append(recipe_name)
+    
+    # Sparse producer/consumer index matching the non-zeros of the LP matrix:
+    # item -> [(recipe_name, coefficient)] in sorted recipe order
+    produces = defaultdict(list)  # coefficient = out_qty * prod_mult
+    consumes = defaultdict(list)  # coefficient = in_qty
+    for recipe_name in sorted_recipe_names:
+        for item, out_qty in recipe_out[recipe_name]:
+            produces[item].append((recipe_name, out_qty * prod_mult[recipe_name]))
+        for item, in_qty in recipe_in[recipe_name]:
+            consumes[item].append((recipe_name, in_qty))
+    
+    def build_lp(maximize_target=False):
+        """Build the LP; returns (prob, x).
+        
+        With maximize_target the target equality is dropped and the objective
+        maximizes the target's net production instead, under the same
+        raw/machine/balance constraints.
+        """
         
         # Create LP problem
-        prob = LpProblem("Factory_Optimization", LpMinimize)
+        if maximize_target:
+            prob = LpProblem("Factory_Max_Target", LpMaximize)
+        else:
+            prob = LpProblem("Factory_Optimization", LpMinimize)
         
         # Decision variables: crafts per minute for each recipe (sorted for determinism)
         x = {}
-        for recipe_name in sorted(recipes.keys()):
+        for recipe_name in sorted_recipe_names:
             x[recipe_name] = LpVariable(f"crafts_{recipe_name}", lowBound=0)
         
         # Objective: minimize total machine usage
-        machine_usage_terms = []
-        for recipe_name in sorted(recipes.keys()):
-            recipe = recipes[recipe_name]
-            eff_crafts = get_eff_crafts_per_min(recipe)
-            machine_usage_terms.append(x[recipe_name] / eff_crafts)
-        
-        prob += sum(machine_usage_terms), "Total_Machine_Usage"
+        if not maximize_target:
+            machine_usage_terms = []
+            for recipe_name in sorted_recipe_names:
+                machine_usage_terms.append(inv_eff[recipe_name] * x[recipe_name])
+            
+            prob += lpSum(machine_usage_terms), "Total_Machine_Usage"
         
         # Conservation constraints for each item
-        for item in sorted(all_items):
-            # Calculate net production (production - consumption)
-            production = []
-            consumption = []
+        for item in sorted_all_items:
+            # Calculate net production (production - consumption) as one
+            # lpSum over production terms and pre-negated consumption terms
+            net_terms = [coef * x[name] for name, coef in produces.get(item, [])]
+            net_terms += [-coef * x[name] for name, coef in consumes.get(item, [])]
             
-            for recipe_name in sorted(recipes.keys()):
-                recipe = recipes[recipe_name]
-                
-                # Production term
-                if item in recipe.get("out", {}):
-                    out_qty = recipe["out"][item]
-                    prod_mult = get_prod_mult(recipe)
-                    production.append(out_qty * prod_mult * x[recipe_name])
-                
-                # Consumption term
-                if item in recipe.get("in", {}):
-                    in_qty = recipe["in"][item]
-                    consumption.append(in_qty * x[recipe_name])
-            
-            net_production = sum(production) - sum(consumption)
+            net_production = lpSum(net_terms)
             
             # Apply constraint based on item type
-            if item == target_item:
+            if item == target_item and maximize_target:
+                # Target item: its net production is the objective
+                prob += net_production, "Target_Output"
+            
+            elif item == target_item:
                 # Target item: must produce exactly the target rate
-                prob += net_production == target_rate_scaled, f"Target_{item}"
+                prob += net_production == target_rate, f"Target_{item}"
             
             elif item in intermediate_items:
                 # Intermediate items (including cyclic): perfect balance (no accumulation)
@@ -329,153 +496,304 @@ def solve_factory_simplex(data):
                     prob += -net_production <= raw_supply[item], f"Raw_Supply_{item}"
         
         # Machine capacity constraints
-        for machine_type in sorted(machines.keys()):
+        for machine_type in sorted_machine_names:
             machine_usage = []
-            for recipe_name in sorted(recipes.keys()):
-                recipe = recipes[recipe_name]
-                if recipe["machine"] == machine_type:
-                    eff_crafts = get_eff_crafts_per_min(recipe)
-                    machine_usage.append(x[recipe_name] / eff_crafts)
+            for recipe_name in recipes_by_machine.get(machine_type, []):
+                machine_usage.append(inv_eff[recipe_name] * x[recipe_name])
             
             if machine_usage:
-                total_usage = sum(machine_usage)
+                total_usage = lpSum(machine_usage)
                 max_cap = max_machines.get(machine_type, float('inf'))
                 if max_cap < float('inf'):
                     prob += total_usage <= max_cap, f"Machine_Cap_{machine_type}"
         
-        # Solve using CBC solver with deterministic settings
-        solver = PULP_CBC_CMD(
-            msg=0,  # Suppress output
-            timeLimit=2,  # 2 second timeout
-            threads=1,  # Single thread for determinism
-            options=['randomS', '42']  # Fixed seed
-        )
-        
-        prob.solve(solver)
-        
-        # Check if solution is optimal
-        if LpStatus[prob.status] != "Optimal":
-            return None
+        return prob, x
+    
+    def extract_result(crafts):
+        """Build the "ok" result from crafts[recipe_name] (None when unset)."""
         
         # Extract results
         per_recipe_crafts = {}
-        for recipe_name in sorted(recipes.keys()):
-            crafts_value = x[recipe_name].varValue
+        for recipe_name in sorted_recipe_names:
+            crafts_value = crafts[recipe_name]
             if crafts_value is not None and crafts_value > 1e-9:
-                recipe = recipes[recipe_name]
-                prod_mult = get_prod_mult(recipe)
                 # Multiply by productivity to get actual output rate
-                per_recipe_crafts[recipe_name] = crafts_value * prod_mult
+                per_recipe_crafts[recipe_name] = crafts_value * prod_mult[recipe_name]
         
         # Calculate machine counts
         machine_counts = {}
-        for machine_type in sorted(machines.keys()):
+        for machine_type in sorted_machine_names:
             count = 0.0
-            for recipe_name in sorted(recipes.keys()):
-                recipe = recipes[recipe_name]
-                if recipe["machine"] == machine_type:
-                    crafts_value = x[recipe_name].varValue
-                    if crafts_value is not None:
-                        eff_crafts = get_eff_crafts_per_min(recipe)
-                        count += crafts_value / eff_crafts
+            for recipe_name in recipes_by_machine.get(machine_type, []):
+                crafts_value = crafts[recipe_name]
+                if crafts_value is not None:
+                    count += crafts_value * inv_eff[recipe_name]
             if count > 1e-9:
                 machine_counts[machine_type] = count
         
         # Calculate raw consumption
         raw_consumption = {}
-        for item in sorted(raw_items):
+        for item in sorted_raw_items:
             consumption = 0.0
-            for recipe_name in sorted(recipes.keys()):
-                recipe = recipes[recipe_name]
-                if item in recipe.get("in", {}):
-                    crafts_value = x[recipe_name].varValue
-                    if crafts_value is not None:
-                        consumption += recipe["in"][item] * crafts_value
+            for recipe_name, in_qty in consumes.get(item, []):
+                crafts_value = crafts[recipe_name]
+                if crafts_value is not None:
+                    consumption += in_qty * crafts_value
             if consumption > 1e-9:
                 raw_consumption[item] = consumption
         
         # Calculate byproduct surplus (if any)
         byproduct_surplus = {}
-        for item in sorted(byproduct_items):
+        for item in sorted_byproduct_items:
             production = 0.0
             consumption = 0.0
-            for recipe_name in sorted(recipes.keys()):
-                recipe = recipes[recipe_name]
-                crafts_value = x[recipe_name].varValue
+            for recipe_name, coef in produces.get(item, []):
+                crafts_value = crafts[recipe_name]
                 if crafts_value is not None:
-                    if item in recipe.get("out", {}):
-                        out_qty = recipe["out"][item]
-                        prod_mult = get_prod_mult(recipe)
-                        production += out_qty * prod_mult * crafts_value
-                    if item in recipe.get("in", {}):
-                        in_qty = recipe["in"][item]
-                        consumption += in_qty * crafts_value
+                    production += coef * crafts_value
+            for recipe_name, in_qty in consumes.get(item, []):
+                crafts_value = crafts[recipe_name]
+                if crafts_value is not None:
+                    consumption += in_qty * crafts_value
             
             surplus = production - consumption
             if surplus > 1e-9:
                 byproduct_surplus[item] = surplus
         
-        result = {
-            "status": "ok",
-            "per_recipe_crafts_per_min": per_recipe_crafts,
-            "per_machine_counts": machine_counts,
-            "raw_consumption_per_min": raw_consumption
-        }
+        # Keys are inserted in sorted order (and every nested dict above is
+        # filled in sorted order), so main() can skip sort_keys
+        result = {}
         
         # Add byproduct surplus if any exist
         if byproduct_surplus:
             result["byproduct_surplus_per_min"] = byproduct_surplus
         
+        result["per_machine_counts"] = machine_counts
+        result["per_recipe_crafts_per_min"] = per_recipe_crafts
+        result["raw_consumption_per_min"] = raw_consumption
+        result["status"] = "ok"
+        
         return result
     
+    def pulp_backend():
+        """(solve_at_target, solve_max_target) on the PuLP models from build_lp."""
+        solver = lp_solver if lp_solver is not None else make_lp_solver()
+        
+        def solve_at_target():
+            """Crafts per recipe at the target rate, or None if infeasible."""
+            prob, x = build_lp()
+            prob.solve(solver)
+            
+            # Check if solution is optimal
+            if LpStatus[prob.status] != "Optimal":
+                return None
+            return {recipe_name: x[recipe_name].varValue for recipe_name in sorted_recipe_names}
+        
+        def solve_max_target():
+            """Largest achievable net target production, or None if not solved."""
+            max_prob, _ = build_lp(maximize_target=True)
+            max_prob.solve(solver)
+            if LpStatus[max_prob.status] != "Optimal":
+                return None
+            return value(max_prob.objective) or 0.0
+        
+        return solve_at_target, solve_max_target
+    
+    def linprog_backend(linprog, csr_matrix):
+        """(solve_at_target, solve_max_target) on a sparse matrix model for scipy's linprog.
+        
+        Rows mirror build_lp exactly, assembled straight from the
+        producers/consumers index into COO triplets (no PuLP expressions).
+        """
+        col = {name: j for j, name in enumerate(sorted_recipe_names)}
+        num_cols = len(sorted_recipe_names)
+        eq_rows, eq_cols, eq_data, b_eq = [], [], [], []
+        ub_rows, ub_cols, ub_data, b_ub = [], [], [], []
+        
+        def add_row(rows, cols, data, rhs, entries, sign, bound):
+            r = len(rhs)
+            for j, coef in entries:
+                rows.append(r)
+                cols.append(j)
+                data.append(sign * coef)
+            rhs.append(bound)
+        
+        target_entries = None
+        for item in sorted_all_items:
+            # Net production row: +coef for producers, -coef for consumers
+            entries = [(col[name], coef) for name, coef in produces.get(item, [])]
+            entries += [(col[name], -coef) for name, coef in consumes.get(item, [])]
+            
+            if item == target_item:
+                target_entries = entries  # added last, after the other equalities
+            elif item in intermediate_items:
+                add_row(eq_rows, eq_cols, eq_data, b_eq, entries, 1, 0.0)
+            elif item in byproduct_items:
+                add_row(ub_rows, ub_cols, ub_data, b_ub, entries, -1, 0.0)
+            elif item in raw_items:
+                add_row(ub_rows, ub_cols, ub_data, b_ub, entries, 1, 0.0)
+                if item in raw_supply:
+                    add_row(ub_rows, ub_cols, ub_data, b_ub, entries, -1, raw_supply[item])
+        
+        for machine_type in sorted_machine_names:
+            names = recipes_by_machine.get(machine_type, [])
+            max_cap = max_machines.get(machine_type, float('inf'))
+            if names and max_cap < float('inf'):
+                entries = [(col[name], inv_eff[name]) for name in names]
+                add_row(ub_rows, ub_cols, ub_data, b_ub, entries, 1, max_cap)
+        
+        def matrix(rows, cols, data, num_rows):
+            if num_rows == 0:
+                return None
+            return csr_matrix((data, (rows, cols)), shape=(num_rows, num_cols))
+        
+        num_balance_rows = len(b_eq)
+        if target_entries is not None:
+            # The target equality is the last A_eq row, so the max-target
+            # model can simply drop it
+            add_row(eq_rows, eq_cols, eq_data, b_eq, target_entries, 1, target_rate)
+        A_eq = matrix(eq_rows, eq_cols, eq_data, len(b_eq))
+        A_ub = matrix(ub_rows, ub_cols, ub_data, len(b_ub))
+        options = {"time_limit": 2}
+        
+        def solve(c, A_eq, b_eq):
+            res = linprog(c, A_ub=A_ub, b_ub=b_ub or None, A_eq=A_eq, b_eq=b_eq or None,
+                          bounds=(0, None), method="highs", options=options)
+            return res if res.status == 0 else None
+        
+        def solve_at_target():
+            """Crafts per recipe at the target rate, or None if infeasible."""
+            res = solve([inv_eff[name] for name in sorted_recipe_names], A_eq, b_eq)
+            if res is None:
+                return None
+            return {name: float(v) for name, v in zip(sorted_recipe_names, res.x)}
+        
+        def solve_max_target():
+            """Largest achievable net target production, or None if not solved."""
+            c = [0.0] * num_cols
+            for j, coef in target_entries or []:
+                c[j] -= coef  # linprog minimizes, so negate the target's net production
+            balance = A_eq[:num_balance_rows] if num_balance_rows else None
+            res = solve(c, balance, b_eq[:num_balance_rows])
+            return None if res is None else -res.fun
+        
+        return solve_at_target, solve_max_target
+    
+    if scipy_api is None:
+        scipy_api = scipy_linprog()
+    if scipy_api is not None and sorted_recipe_names:
+        solve_at_target, solve_max_target = linprog_backend(*scipy_api)
+    else:
+        solve_at_target, solve_max_target = pulp_backend()
+    
     # Try to solve with the target rate
-    result = try_solve_lp(target_rate)
+    crafts = solve_at_target()
     
-    if result:
-        return result
+    if crafts is not None:
+        return extract_result(crafts)
     
-    # If infeasible, use binary search to find max feasible rate
-    low, high = 0.0, target_rate
-    max_feasible = 0.0
+    # If infeasible, the max feasible rate is the optimum of the same LP with
+    # the target equality replaced by maximizing the target's net production
+    # (x = 0 is always feasible, so the feasible target rates form [0, max])
+    best = solve_max_target()
     
-    for _ in range(50):
-        mid = (low + high) / 2
-        test_result = try_solve_lp(mid)
-        
-        if test_result:
-            max_feasible = mid
-            low = mid
-        else:
-            high = mid
-        
-        if high - low < 0.01:
-            break
+    max_feasible = 0.0
+    if best is not None:
+        max_feasible = min(max(best, 0.0), target_rate)
     
     # Identify bottlenecks
     bottlenecks = []
     if max_feasible < target_rate * 0.95:
-        for machine_type in sorted(machines.keys()):
+        for machine_type in sorted_machine_names:
             bottlenecks.append(f"{machine_type} cap")
-        for item in sorted(raw_items):
+        for item in sorted_raw_items:
             if item in raw_supply:
                 bottlenecks.append(f"{item} supply")
     
     return {
-        "status": "infeasible",
+        "bottleneck_hint": bottlenecks[:2] if bottlenecks else ["unknown"],
         "max_feasible_target_per_min": round(max_feasible, 2),
-        "bottleneck_hint": bottlenecks[:2] if bottlenecks else ["unknown"]
+        "status": "infeasible"
     }
 
 
+class FactorySolver:
+    """Solver for a stream of factory problems.
+    
+    Keeps one LP solver (and backend choice) for every solve. With
+    cache_size > 0, repeated identical problems are answered from an LRU
+    cache of up to cache_size results; the default 0 re-solves every call.
+    solve(data) returns the same dict as the module-level solve(data).
+    """
+    
+    def __init__(self, cache_size=0):
+        self.lp_solver = make_lp_solver()
+        self.scipy_api = scipy_linprog()
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # canonical input JSON -> result JSON
+    
+    def solve(self, data):
+        if not self.cache_size:
+            return solve_factory_simplex(data, self.lp_solver, self.scipy_api)
+        
+        key = json.dumps(data, sort_keys=True, separators=(",", ":"))
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return json.loads(cached)  # a fresh dict, in the original key order
+        
+        result = solve_factory_simplex(data, self.lp_solver, self.scipy_api)
+        self._cache[key] = json.dumps(result)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+
+def solve(data):
+    """Solve one factory problem given as a parsed JSON dict; returns the output dict."""
+    # Solve using simplex method (Linear Programming)
+    return solve_factory_simplex(data)
+
+
+def serve():
+    """Answer one JSON problem per stdin line with one JSON result line.
+    
+    Replies are compact JSON with sorted keys. A line that can't be parsed
+    or solved gets {"error": ..., "status": "error"} and the loop carries on.
+    
+    Every line is solved afresh unless FACTORY_SERVER_CACHE=N is set, which
+    answers repeats from an LRU cache of N results.
+    """
+    loads = orjson.loads if orjson is not None else json.loads
+    solver = FactorySolver(cache_size=int(os.environ.get("FACTORY_SERVER_CACHE") or 0))
+    for line in sys.stdin.buffer:
+        if not line.strip():
+            continue
+        try:
+            result = solver.solve(loads(line))
+        except Exception as e:
+            result = {"error": repr(e), "status": "error"}
+        sys.stdout.write(json.dumps(result, sort_keys=True, separators=(",", ":")) + "\n")
+        sys.stdout.flush()
+
+
 def main():
+    # Long-running mode: one request per line until stdin closes
+    if "--server" in sys.argv[1:]:
+        serve()
+        return
+    
     # Read JSON from stdin
-    data = json.load(sys.stdin)
+    if orjson is not None:
+        data = orjson.loads(sys.stdin.buffer.read())
+    else:
+        data = json.load(sys.stdin)
     
-    # Solve using simplex method (Linear Programming)
-    result = solve_factory_simplex(data)
+    # Solve
+    result = solve(data)
     
-    # Write JSON to stdout
-    json.dump(result, sys.stdout, sort_keys=True)
+    # Write JSON to stdout; result dicts are already built in sorted key order
+    json.dump(result, sys.stdout, separators=(",", ":"))
 
 
 if __name__ == "__main__":
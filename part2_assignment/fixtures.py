@@ -0,0 +1,76 @@
+"""
+Shared tool inputs used by both run_samples.py and the tests.
+
+These are plain dicts so they can be passed straight to json.dumps / orjson
+and to the solvers. Neither solver mutates its input; callers must treat
+them as read-only too.
+"""
+
+# Spec example: green circuits from plates, with modules on both machines
+BASIC_FACTORY = {
+    "machines": {
+        "assembler_1": {"crafts_per_min": 30},
+        "chemical": {"crafts_per_min": 60}
+    },
+    "recipes": {
+        "iron_plate": {
+            "machine": "chemical",
+            "time_s": 3.2,
+            "in": {"iron_ore": 1},
+            "out": {"iron_plate": 1}
+        },
+        "copper_plate": {
+            "machine": "chemical",
+            "time_s": 3.2,
+            "in": {"copper_ore": 1},
+            "out": {"copper_plate": 1}
+        },
+        "green_circuit": {
+            "machine": "assembler_1",
+            "time_s": 0.5,
+            "in": {"iron_plate": 1, "copper_plate": 3},
+            "out": {"green_circuit": 1}
+        }
+    },
+    "modules": {
+        "assembler_1": {"prod": 0.1, "speed": 0.15},
+        "chemical": {"prod": 0.2, "speed": 0.1}
+    },
+    "limits": {
+        "raw_supply_per_min": {"iron_ore": 5000, "copper_ore": 5000},
+        "max_machines": {"assembler_1": 300, "chemical": 300}
+    },
+    "target": {"item": "green_circuit", "rate_per_min": 1800}
+}
+
+# Needs 1000 raw/min but only 500 is available
+INFEASIBLE_RAW_FACTORY = {
+    "machines": {
+        "assembler": {"crafts_per_min": 100}
+    },
+    "recipes": {
+        "product": {
+            "machine": "assembler",
+            "time_s": 1.0,
+            "in": {"raw": 10},
+            "out": {"product": 1}
+        }
+    },
+    "modules": {},
+    "limits": {
+        "raw_supply_per_min": {"raw": 500},
+        "max_machines": {"assembler": 100}
+    },
+    "target": {"item": "product", "rate_per_min": 100}
+}
+
+# Single edge, supply well under capacity
+SIMPLE_BELTS = {
+    "edges": [
+        {"from": "s1", "to": "sink", "lo": 0, "hi": 1000}
+    ],
+    "sources": [
+        {"node": "s1", "supply": 500}
+    ],
+    "sink": "sink"
+}
@@ -3,27 +3,167 @@
 Run sample test cases for both factory and belts CLI tools.
 
 Usage:
-    python run_samples.py
+    python run_samples.py [--cache]
     python run_samples.py "python factory/main.py" "python belts/main.py"
+
+With --cache, results of the default (in-process) commands are cached in
+.samples_cache/, keyed by the command, the sample input, the solver sources
+and the factory LP backend, so unchanged samples are not re-solved. Custom commands are always
+run: their behaviour isn't covered by the solver-source hash.
 """
 
+import argparse
+import functools
+import hashlib
+import io
 import json
+import os
 import subprocess
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+from fixtures import BASIC_FACTORY, INFEASIBLE_RAW_FACTORY, SIMPLE_BELTS
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+DEFAULT_FACTORY_CMD = f"{sys.executable} factory/main.py"
+DEFAULT_BELTS_CMD = f"{sys.executable} belts/main.py"
+
+ROOT = Path(__file__).resolve().parent
+CACHE_DIR = ROOT / ".samples_cache"
+SOLVER_SOURCES = (ROOT / "factory" / "main.py", ROOT / "belts" / "main.py")
+
+
+@functools.lru_cache(maxsize=None)
+def solver_digest():
+    """Hash of the solver sources; any solver edit invalidates the cache."""
+    h = hashlib.sha256()
+    for path in SOLVER_SOURCES:
+        h.update(path.read_bytes())
+    return h.digest()
+
+
+@functools.lru_cache(maxsize=None)
+def backend_digest():
+    """Hash of the factory LP backend in use and its settings.
+    
+    Tied LPs can come out differently on each backend, so the resolved
+    backend name, every FACTORY_* variable and the PuLP version all key
+    the cache alongside the solver sources.
+    """
+    import pulp
+    from factory.main import lp_backend_name
+    
+    settings = sorted((k, v) for k, v in os.environ.items() if k.startswith("FACTORY_"))
+    key = [lp_backend_name(), pulp.__version__, settings]
+    return hashlib.sha256(json.dumps(key).encode()).digest()
+
+
+def cache_path(cmd, input_data):
+    """Cache file for one (command, input) pair under the current solvers."""
+    h = hashlib.sha256(solver_digest())
+    if cmd == DEFAULT_FACTORY_CMD:
+        h.update(backend_digest())  # belts results don't depend on it
+    h.update(cmd.encode())
+    h.update(b"\0")
+    h.update(json.dumps(input_data, sort_keys=True, separators=(",", ":")).encode())
+    return CACHE_DIR / f"{h.hexdigest()}.json"
+
+
+def load_cached(path):
+    """Cached output at path, or None on a miss (or an unreadable entry)."""
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def store_cached(path, output):
+    try:
+        CACHE_DIR.mkdir(exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(output, sort_keys=True))
+        tmp.replace(path)
+    except OSError:
+        pass  # Caching is best-effort
+
+
+def in_process_solver(cmd):
+    """Return the solve() function behind a default command, or None."""
+    if cmd == DEFAULT_FACTORY_CMD:
+        from factory.main import solve
+        return solve
+    if cmd == DEFAULT_BELTS_CMD:
+        from belts.main import solve
+        return solve
+    return None
+
+
+def encode_payload(input_data):
+    """Serialize a tool input to the bytes sent on a subprocess's stdin."""
+    if orjson is not None:
+        return orjson.dumps(input_data)
+    return json.dumps(input_data).encode()
 
-def run_tool(cmd, input_data, timeout=2):
-    """Run a CLI tool with given input."""
+
+def run_tool(cmd, input_data, timeout=2, payload=None):
+    """Run a CLI tool with given input.
+    
+    The default commands are solved in-process; custom command strings
+    are run as subprocesses, fed `payload` (pre-encoded input bytes) when
+    given, else the encoded input_data. Either way a solve taking longer
+    than `timeout` seconds is reported as a failure.
+    """
     start_time = time.time()
     
+    solve = in_process_solver(cmd)
+    if solve is not None:
+        # Solve on a daemon thread so a runaway solve can't hang the run
+        outcome = {}
+        
+        def target():
+            try:
+                outcome["output"] = solve(input_data)
+            except Exception as e:
+                outcome["error"] = repr(e)
+        
+        worker = threading.Thread(target=target, daemon=True)
+        worker.start()
+        worker.join(timeout)
+        
+        if worker.is_alive():
+            return {
+                "success": False,
+                "error": f"Timeout (>{timeout}s)",
+                "elapsed": timeout
+            }
+        if "error" in outcome:
+            return {
+                "success": False,
+                "error": outcome["error"],
+                "elapsed": time.time() - start_time
+            }
+        
+        return {
+            "success": True,
+            "output": outcome["output"],
+            "elapsed": time.time() - start_time
+        }
+    
+    if payload is None:
+        payload = encode_payload(input_data)
+    
     try:
         result = subprocess.run(
             cmd.split(),
-            input=json.dumps(input_data),
+            input=payload,
             capture_output=True,
-            text=True,
             timeout=timeout
         )
         
@@ -32,11 +172,12 @@ def run_tool(cmd, input_data, timeout=2):
         if result.returncode != 0:
             return {
                 "success": False,
-                "error": result.stderr,
+                "error": result.stderr.decode("utf-8", "replace"),
                 "elapsed": elapsed
             }
         
-        output = json.loads(result.stdout)
+        # orjson.JSONDecodeError subclasses json.JSONDecodeError
+        output = orjson.loads(result.stdout) if orjson is not None else json.loads(result.stdout)
         
         return {
             "success": True,
@@ -58,119 +199,15 @@ def run_tool(cmd, input_data, timeout=2):
         }
 
 
-def test_factory_samples(factory_cmd):
-    """Run factory sample tests."""
-    print("\n" + "="*60)
-    print("FACTORY TESTS")
-    print("="*60)
-    
-    samples = []
-    
-    # Sample 1: Basic feasible case
-    samples.append({
-        "name": "Basic feasible production",
-        "input": {
-            "machines": {
-                "assembler_1": {"crafts_per_min": 30},
-                "chemical": {"crafts_per_min": 60}
-            },
-            "recipes": {
-                "iron_plate": {
-                    "machine": "chemical",
-                    "time_s": 3.2,
-                    "in": {"iron_ore": 1},
-                    "out": {"iron_plate": 1}
-                },
-                "copper_plate": {
-                    "machine": "chemical",
-                    "time_s": 3.2,
-                    "in": {"copper_ore": 1},
-                    "out": {"copper_plate": 1}
-                },
-                "green_circuit": {
-                    "machine": "assembler_1",
-                    "time_s": 0.5,
-                    "in": {"iron_plate": 1, "copper_plate": 3},
-                    "out": {"green_circuit": 1}
-                }
-            },
-            "modules": {
-                "assembler_1": {"prod": 0.1, "speed": 0.15},
-                "chemical": {"prod": 0.2, "speed": 0.1}
-            },
-            "limits": {
-                "raw_supply_per_min": {"iron_ore": 5000, "copper_ore": 5000},
-                "max_machines": {"assembler_1": 300, "chemical": 300}
-            },
-            "target": {"item": "green_circuit", "rate_per_min": 1800}
-        }
-    })
-    
-    # Sample 2: Infeasible case
-    samples.append({
-        "name": "Infeasible (insufficient raw)",
-        "input": {
-            "machines": {"assembler": {"crafts_per_min": 100}},
-            "recipes": {
-                "product": {
-                    "machine": "assembler",
-                    "time_s": 1.0,
-                    "in": {"raw": 10},
-                    "out": {"product": 1}
-                }
-            },
-            "modules": {},
-            "limits": {
-                "raw_supply_per_min": {"raw": 500},
-                "max_machines": {"assembler": 100}
-            },
-            "target": {"item": "product", "rate_per_min": 100}
-        }
-    })
-    
-    # Run samples
-    for i, sample in enumerate(samples, 1):
-        print(f"\n[{i}/{len(samples)}] {sample['name']}")
-        print("-" * 60)
-        
-        result = run_tool(factory_cmd, sample["input"])
-        
-        if result["success"]:
-            print(f"✓ Status: {result['output']['status']}")
-            print(f"✓ Time: {result['elapsed']:.3f}s")
-            
-            if result['output']['status'] == 'ok':
-                print(f"  Recipes used: {len(result['output']['per_recipe_crafts_per_min'])}")
-                print(f"  Machines: {result['output']['per_machine_counts']}")
-            else:
-                print(f"  Max feasible: {result['output'].get('max_feasible_target_per_min', 'N/A')}")
-        else:
-            print(f"✗ FAILED: {result['error']}")
-            print(f"  Time: {result['elapsed']:.3f}s")
-
+FACTORY_SAMPLES = [
+    {"name": "Basic feasible production", "input": BASIC_FACTORY},
+    {"name": "Infeasible (insufficient raw)", "input": INFEASIBLE_RAW_FACTORY},
+]
 
-def test_belts_samples(belts_cmd):
-    """Run belts sample tests."""
-    print("\n" + "="*60)
-    print("BELTS TESTS")
-    print("="*60)
-    
-    samples = []
-    
-    # Sample 1: Simple flow
-    samples.append({
-        "name": "Simple source to sink",
-        "input": {
-            "edges": [
-                {"from": "s1", "to": "sink", "lo": 0, "hi": 1000}
-            ],
-            "sources": [{"node": "s1", "supply": 500}],
-            "sink": "sink"
-        }
-    })
-    
-    # Sample 2: Multi-path network (spec example)
-    samples.append({
+BELTS_SAMPLES = [
+    {"name": "Simple source to sink", "input": SIMPLE_BELTS},
+    # Multi-path network (spec example)
+    {
         "name": "Multi-source with parallel paths",
         "input": {
             "edges": [
@@ -187,43 +224,111 @@ def test_belts_samples(belts_cmd):
             ],
             "sink": "sink"
         }
-    })
+    },
+]
+
+
+def format_factory(output):
+    """Detail lines for one factory result."""
+    if output['status'] == 'ok':
+        return [
+            f"  Recipes used: {len(output['per_recipe_crafts_per_min'])}",
+            f"  Machines: {output['per_machine_counts']}",
+        ]
+    return [f"  Max feasible: {output.get('max_feasible_target_per_min', 'N/A')}"]
+
+
+def format_belts(output):
+    """Detail lines for one belts result."""
+    if output['status'] == 'ok':
+        return [
+            f"  Max flow: {output['max_flow_per_min']}",
+            f"  Edges with flow: {len(output['flows'])}",
+        ]
+    return [f"  Deficit: {output['deficit']['demand_balance']}"]
+
+
+def run_suite(suite_name, cmd, samples, format_output, use_cache=False):
+    """Run all samples concurrently, then print their reports in order.
+    
+    Each sample is reported into its own buffer, with format_output(output)
+    supplying the tool-specific lines, so output stays identical to a
+    serial run. With use_cache, samples with a cached result are not re-run;
+    the cache only applies to the default commands.
+    """
+    print("\n" + "="*60)
+    print(suite_name)
+    print("="*60)
     
-    # Run samples
-    for i, sample in enumerate(samples, 1):
-        print(f"\n[{i}/{len(samples)}] {sample['name']}")
-        print("-" * 60)
+    if in_process_solver(cmd) is None:
+        # A custom command may run anything; only solver edits invalidate the cache
+        use_cache = False
+        # Freeze each sample's stdin bytes once, outside the timed runs
+        for sample in samples:
+            sample.setdefault("payload", encode_payload(sample["input"]))
+    
+    def run_sample(i, sample):
+        out = io.StringIO()
+        print(f"\n[{i}/{len(samples)}] {sample['name']}", file=out)
+        print("-" * 60, file=out)
+        
+        cached = None
+        if use_cache:
+            path = cache_path(cmd, sample["input"])
+            cached = load_cached(path)
         
-        result = run_tool(belts_cmd, sample["input"])
+        if cached is not None:
+            result = {"success": True, "output": cached, "elapsed": 0.0}
+        else:
+            result = run_tool(cmd, sample["input"], payload=sample.get("payload"))
+            if use_cache and result["success"]:
+                store_cached(path, result["output"])
         
         if result["success"]:
-            print(f"✓ Status: {result['output']['status']}")
-            print(f"✓ Time: {result['elapsed']:.3f}s")
-            
-            if result['output']['status'] == 'ok':
-                print(f"  Max flow: {result['output']['max_flow_per_min']}")
-                print(f"  Edges with flow: {len(result['output']['flows'])}")
+            print(f"✓ Status: {result['output']['status']}", file=out)
+            if cached is not None:
+                print("✓ Time: cached", file=out)
             else:
-                print(f"  Deficit: {result['output']['deficit']['demand_balance']}")
+                print(f"✓ Time: {result['elapsed']:.3f}s", file=out)
+            for line in format_output(result['output']):
+                print(line, file=out)
         else:
-            print(f"✗ FAILED: {result['error']}")
-            print(f"  Time: {result['elapsed']:.3f}s")
+            print(f"✗ FAILED: {result['error']}", file=out)
+            print(f"  Time: {result['elapsed']:.3f}s", file=out)
+        return out.getvalue()
+    
+    workers = min(len(samples), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        for text in ex.map(run_sample, range(1, len(samples) + 1), samples):
+            sys.stdout.write(text)
+
+
+def test_factory_samples(factory_cmd, use_cache=False):
+    """Run factory sample tests."""
+    run_suite("FACTORY TESTS", factory_cmd, FACTORY_SAMPLES, format_factory, use_cache)
+
+
+def test_belts_samples(belts_cmd, use_cache=False):
+    """Run belts sample tests."""
+    run_suite("BELTS TESTS", belts_cmd, BELTS_SAMPLES, format_belts, use_cache)
 
 
 def main():
-    if len(sys.argv) > 2:
-        factory_cmd = sys.argv[1]
-        belts_cmd = sys.argv[2]
-    else:
-        factory_cmd = f"{sys.executable} factory/main.py"
-        belts_cmd = f"{sys.executable} belts/main.py"
+    parser = argparse.ArgumentParser(description="Run sample test cases for both tools.")
+    parser.add_argument("factory_cmd", nargs="?", default=DEFAULT_FACTORY_CMD)
+    parser.add_argument("belts_cmd", nargs="?", default=DEFAULT_BELTS_CMD)
+    parser.add_argument("--cache", action="store_true",
+                        help="reuse and update .samples_cache/ (default commands only)")
+    args = parser.parse_args()
+    factory_cmd = args.factory_cmd
+    belts_cmd = args.belts_cmd
     
     print("Running sample tests...")
     print(f"Factory command: {factory_cmd}")
     print(f"Belts command: {belts_cmd}")
     
-    test_factory_samples(factory_cmd)
-    test_belts_samples(belts_cmd)
+    test_factory_samples(factory_cmd, use_cache=args.cache)
+    test_belts_samples(belts_cmd, use_cache=args.cache)
     
     print("\n" + "="*60)
     print("SAMPLE TESTS COMPLETE")
@@ -2,72 +2,61 @@
 """
 Unit tests for the factory CLI tool.
 Run with: pytest tests/test_factory.py -v
-Or: python tests/test_factory.py
+Or: python tests/test_factory.py [--jobs N | --serial]
 """
 
+import argparse
 import json
-import subprocess
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
 
+import pytest
 
-def run_factory(input_data):
-    """Run factory tool with given input, return parsed output."""
-    cmd = [sys.executable, "factory/main.py"]
-    result = subprocess.run(
-        cmd,
-        input=json.dumps(input_data),
-        capture_output=True,
-        text=True,
-        timeout=3
-    )
-    
-    if result.returncode != 0:
-        raise Exception(f"Factory failed: {result.stderr}")
-    
-    return json.loads(result.stdout)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
+# Make the tool packages importable when pytest is run from any directory
+sys.path.insert(0, ROOT)
 
-def test_basic_feasible():
-    """Test basic feasible case from spec."""
-    input_data = {
-        "machines": {
-            "assembler_1": {"crafts_per_min": 30},
-            "chemical": {"crafts_per_min": 60}
-        },
-        "recipes": {
-            "iron_plate": {
-                "machine": "chemical",
-                "time_s": 3.2,
-                "in": {"iron_ore": 1},
-                "out": {"iron_plate": 1}
-            },
-            "copper_plate": {
-                "machine": "chemical",
-                "time_s": 3.2,
-                "in": {"copper_ore": 1},
-                "out": {"copper_plate": 1}
-            },
-            "green_circuit": {
-                "machine": "assembler_1",
-                "time_s": 0.5,
-                "in": {"iron_plate": 1, "copper_plate": 3},
-                "out": {"green_circuit": 1}
-            }
-        },
-        "modules": {
-            "assembler_1": {"prod": 0.1, "speed": 0.15},
-            "chemical": {"prod": 0.2, "speed": 0.1}
-        },
-        "limits": {
-            "raw_supply_per_min": {"iron_ore": 5000, "copper_ore": 5000},
-            "max_machines": {"assembler_1": 300, "chemical": 300}
-        },
-        "target": {"item": "green_circuit", "rate_per_min": 1800}
-    }
+from factory.main import (FactorySolver, load_scipy_linprog, make_cbc_solver, make_highs_solver,
+                          solve, solve_factory, solve_factory_simplex)
+from fixtures import BASIC_FACTORY, INFEASIBLE_RAW_FACTORY
+from tool_client import ToolClient, encode
+
+
+# One solver for the whole session; no result cache, so every call re-solves
+# (test_determinism relies on that)
+_solver = FactorySolver()
+
+_client = ToolClient("factory")
+
+
+def run_factory(input_data, payload=None):
+    """Run factory tool with given input, return parsed output.
+    
+    Solves in-process by default. Set FACTORY_CMD (e.g. "python factory/main.py")
+    to run that command as a subprocess instead, for end-to-end coverage.
     
-    result = run_factory(input_data)
+    With FACTORY_TEST_SERVER=1, inputs are sent instead to one long-lived
+    `factory/main.py --server` process (or FACTORY_CMD plus --server).
     
+    payload, if given, is input_data already encoded with tool_client.encode();
+    the subprocess modes send it as-is (the in-process solver takes the dict).
+    """
+    if not _client.out_of_process():
+        try:
+            return _solver.solve(input_data)
+        except Exception as e:
+            raise Exception(f"Factory failed: {e!r}") from e
+    
+    if payload is None:
+        payload = encode(input_data)
+    
+    return _client.run(payload)
+
+
+def check_basic_feasible(result):
+    """Basic feasible case from spec."""
     assert result["status"] == "ok"
     assert "per_recipe_crafts_per_min" in result
     assert "per_machine_counts" in result
@@ -77,136 +66,107 @@ def test_basic_feasible():
     # With 10% productivity: 1636.36 crafts * 1.1 = 1800 items/min
     green_crafts = result["per_recipe_crafts_per_min"]["green_circuit"]
     assert abs(green_crafts - 1800) < 0.1
-    
-    print("✓ Basic feasible test passed")
 
 
-def test_infeasible_raw_supply():
-    """Test infeasibility due to insufficient raw materials."""
-    input_data = {
-        "machines": {
-            "assembler": {"crafts_per_min": 100}
-        },
-        "recipes": {
-            "product": {
-                "machine": "assembler",
-                "time_s": 1.0,
-                "in": {"raw": 10},
-                "out": {"product": 1}
-            }
-        },
-        "modules": {},
-        "limits": {
-            "raw_supply_per_min": {"raw": 500},  # Not enough!
-            "max_machines": {"assembler": 100}
-        },
-        "target": {"item": "product", "rate_per_min": 100}  # Needs 1000 raw/min
-    }
-    
-    result = run_factory(input_data)
-    
+def check_infeasible_raw_supply(result):
+    """Infeasibility due to insufficient raw materials (needs 1000 raw/min, only 500 available)."""
     assert result["status"] == "infeasible"
     assert "max_feasible_target_per_min" in result
     assert result["max_feasible_target_per_min"] < 100
-    
-    print("✓ Infeasible raw supply test passed")
+    # 500 raw/min at 10 raw per product caps the target at exactly 50/min
+    assert abs(result["max_feasible_target_per_min"] - 50.0) < 0.01
 
 
-def test_infeasible_machine_cap():
-    """Test infeasibility due to insufficient machines."""
-    input_data = {
-        "machines": {
-            "assembler": {"crafts_per_min": 10}
-        },
-        "recipes": {
-            "product": {
-                "machine": "assembler",
-                "time_s": 6.0,  # 10 crafts/min * 60/6 = 100 crafts/min per machine
-                "in": {"raw": 1},
-                "out": {"product": 1}
-            }
-        },
-        "modules": {},
-        "limits": {
-            "raw_supply_per_min": {"raw": 10000},
-            "max_machines": {"assembler": 5}  # Can only do 500 crafts/min max
-        },
-        "target": {"item": "product", "rate_per_min": 1000}  # Needs 10 machines
-    }
-    
-    result = run_factory(input_data)
-    
+MACHINE_CAP_INPUT = {
+    "machines": {
+        "assembler": {"crafts_per_min": 10}
+    },
+    "recipes": {
+        "product": {
+            "machine": "assembler",
+            "time_s": 6.0,  # 10 crafts/min * 60/6 = 100 crafts/min per machine
+            "in": {"raw": 1},
+            "out": {"product": 1}
+        }
+    },
+    "modules": {},
+    "limits": {
+        "raw_supply_per_min": {"raw": 10000},
+        "max_machines": {"assembler": 5}  # Can only do 500 crafts/min max
+    },
+    "target": {"item": "product", "rate_per_min": 1000}  # Needs 10 machines
+}
+
+
+def check_infeasible_machine_cap(result):
+    """Infeasibility due to insufficient machines."""
     assert result["status"] == "infeasible"
     assert "max_feasible_target_per_min" in result
     assert result["max_feasible_target_per_min"] <= 500
-    
-    print("✓ Infeasible machine cap test passed")
+    # 5 machines at 100 crafts/min each cap the target at exactly 500/min
+    assert abs(result["max_feasible_target_per_min"] - 500.0) < 0.01
 
 
-def test_no_modules():
-    """Test case without any modules."""
-    input_data = {
-        "machines": {
-            "assembler": {"crafts_per_min": 60}
-        },
-        "recipes": {
-            "product": {
-                "machine": "assembler",
-                "time_s": 2.0,
-                "in": {"raw": 1},
-                "out": {"product": 1}
-            }
-        },
-        "modules": {},
-        "limits": {
-            "raw_supply_per_min": {"raw": 5000},
-            "max_machines": {"assembler": 100}
-        },
-        "target": {"item": "product", "rate_per_min": 900}
-    }
-    
-    result = run_factory(input_data)
-    
+NO_MODULES_INPUT = {
+    "machines": {
+        "assembler": {"crafts_per_min": 60}
+    },
+    "recipes": {
+        "product": {
+            "machine": "assembler",
+            "time_s": 2.0,
+            "in": {"raw": 1},
+            "out": {"product": 1}
+        }
+    },
+    "modules": {},
+    "limits": {
+        "raw_supply_per_min": {"raw": 5000},
+        "max_machines": {"assembler": 100}
+    },
+    "target": {"item": "product", "rate_per_min": 900}
+}
+
+
+def check_no_modules(result):
+    """Case without any modules."""
     assert result["status"] == "ok"
     # 60 crafts/min * 60 / 2.0 = 1800 crafts/min per machine
     # Need 900 crafts/min -> 0.5 machines
     machines_used = result["per_machine_counts"]["assembler"]
     assert abs(machines_used - 0.5) < 0.01
-    
-    print("✓ No modules test passed")
 
 
-def test_chain_production():
-    """Test production chain with intermediates."""
-    input_data = {
-        "machines": {
-            "machine_a": {"crafts_per_min": 60},
-            "machine_b": {"crafts_per_min": 30}
-        },
-        "recipes": {
-            "step1": {
-                "machine": "machine_a",
-                "time_s": 1.0,
-                "in": {"raw": 2},
-                "out": {"intermediate": 1}
-            },
-            "step2": {
-                "machine": "machine_b",
-                "time_s": 2.0,
-                "in": {"intermediate": 3},
-                "out": {"final": 1}
-            }
-        },
-        "modules": {},
-        "limits": {
-            "raw_supply_per_min": {"raw": 10000},
-            "max_machines": {"machine_a": 100, "machine_b": 100}
+CHAIN_INPUT = {
+    "machines": {
+        "machine_a": {"crafts_per_min": 60},
+        "machine_b": {"crafts_per_min": 30}
+    },
+    "recipes": {
+        "step1": {
+            "machine": "machine_a",
+            "time_s": 1.0,
+            "in": {"raw": 2},
+            "out": {"intermediate": 1}
         },
-        "target": {"item": "final", "rate_per_min": 300}
-    }
-    
-    result = run_factory(input_data)
-    
+        "step2": {
+            "machine": "machine_b",
+            "time_s": 2.0,
+            "in": {"intermediate": 3},
+            "out": {"final": 1}
+        }
+    },
+    "modules": {},
+    "limits": {
+        "raw_supply_per_min": {"raw": 10000},
+        "max_machines": {"machine_a": 100, "machine_b": 100}
+    },
+    "target": {"item": "final", "rate_per_min": 300}
+}
+
+
+def check_chain_production(result):
+    """Production chain with intermediates."""
     assert result["status"] == "ok"
     
     # Need 300 final/min
@@ -214,8 +174,182 @@ def test_chain_production():
     # step1: 900 intermediate needs 1800 raw
     raw_used = result["raw_consumption_per_min"]["raw"]
     assert abs(raw_used - 1800) < 1
+
+
+# Two recipes make p on the same machine at the same speed, so any split between
+# them uses the same machines: the LP has tied optima and backends may differ
+TIED_INPUT = {
+    "machines": {
+        "m": {"crafts_per_min": 60}
+    },
+    "recipes": {
+        "a_cheap": {
+            "machine": "m",
+            "time_s": 1.0,
+            "in": {"ore": 1},
+            "out": {"p": 1}
+        },
+        "b_costly": {
+            "machine": "m",
+            "time_s": 1.0,
+            "in": {"ore": 3},
+            "out": {"p": 1}
+        }
+    },
+    "modules": {},
+    "limits": {
+        "raw_supply_per_min": {"ore": 10000},
+        "max_machines": {"m": 100}
+    },
+    "target": {"item": "p", "rate_per_min": 60}
+}
+
+
+# (name, input, check) for every single-solve test
+CASES = [
+    ("basic_feasible", BASIC_FACTORY, check_basic_feasible),
+    ("infeasible_raw_supply", INFEASIBLE_RAW_FACTORY, check_infeasible_raw_supply),
+    ("infeasible_machine_cap", MACHINE_CAP_INPUT, check_infeasible_machine_cap),
+    ("no_modules", NO_MODULES_INPUT, check_no_modules),
+    ("chain_production", CHAIN_INPUT, check_chain_production),
+]
+
+
+@pytest.mark.parametrize("input_data,check", [case[1:] for case in CASES], ids=[case[0] for case in CASES])
+def test_case(input_data, check):
+    """Solve one case and run its checks."""
+    check(run_factory(input_data))
+
+
+# LP backends solve_factory_simplex can use: name -> kwargs factory; the
+# factory returns None when the backend is not installed
+BACKENDS = {
+    "cbc": lambda: {"lp_solver": make_cbc_solver()},
+    "highs": lambda: {"lp_solver": make_highs_solver()} if make_highs_solver() is not None else None,
+    "scipy": lambda: {"scipy_api": load_scipy_linprog()} if load_scipy_linprog() is not None else None,
+}
+
+
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+@pytest.mark.parametrize("input_data,check", [case[1:] for case in CASES], ids=[case[0] for case in CASES])
+def test_case_backend(backend, input_data, check):
+    """Every case gives the same answers on each LP backend, not just the default one."""
+    kwargs = BACKENDS[backend]()
+    if kwargs is None:
+        pytest.skip(f"{backend} backend not installed")
+    check(solve_factory_simplex(input_data, **kwargs))
+
+
+@pytest.mark.parametrize("backend", sorted(set(BACKENDS) - {"cbc"}))
+@pytest.mark.parametrize("input_data,tied",
+                         [(case[1], False) for case in CASES] + [(TIED_INPUT, True)],
+                         ids=[case[0] for case in CASES] + ["tied_optimum"])
+def test_backend_matches_cbc(backend, input_data, tied):
+    """Each alternative backend reproduces CBC's result, to solver tolerance.
+    
+    On a tied LP only the optimum's value is shared, so just the status and
+    the minimized machine counts are compared; the recipe mix may differ.
+    """
+    kwargs = BACKENDS[backend]()
+    if kwargs is None:
+        pytest.skip(f"{backend} backend not installed")
+    expected = solve_factory_simplex(input_data, **BACKENDS["cbc"]())
+    result = solve_factory_simplex(input_data, **kwargs)
     
-    print("✓ Chain production test passed")
+    if tied:
+        expected = {key: expected[key] for key in ("status", "per_machine_counts")}
+    else:
+        assert result.keys() == expected.keys()
+    for key, value in expected.items():
+        if isinstance(value, (dict, float)):
+            assert result[key] == pytest.approx(value, rel=1e-6, abs=1e-6), key
+        else:
+            assert result[key] == value, key
+
+
+def test_default_backend_is_cbc(monkeypatch):
+    """The default solve uses CBC even when other backends are installed."""
+    # On a tied LP the backends disagree, so this catches a silent switch
+    monkeypatch.delenv("FACTORY_LP_BACKEND", raising=False)
+    expected = solve_factory_simplex(TIED_INPUT, make_cbc_solver())
+    
+    assert solve(TIED_INPUT) == expected
+    assert FactorySolver().solve(TIED_INPUT) == expected
+
+
+# top needs left and right, which both need base: demand for base arrives
+# along two paths and must be summed before base is sized
+DIAMOND_INPUT = {
+    "machines": {
+        "m": {"crafts_per_min": 60}
+    },
+    "recipes": {
+        "top": {"machine": "m", "time_s": 1.0, "in": {"left": 1, "right": 1}, "out": {"top": 1}},
+        "left": {"machine": "m", "time_s": 1.0, "in": {"base": 1}, "out": {"left": 1}},
+        "right": {"machine": "m", "time_s": 1.0, "in": {"base": 1}, "out": {"right": 1}},
+        "base": {"machine": "m", "time_s": 1.0, "in": {"ore": 1}, "out": {"base": 1}}
+    },
+    "modules": {},
+    "limits": {
+        "raw_supply_per_min": {"ore": 10000},
+        "max_machines": {"m": 100}
+    },
+    "target": {"item": "top", "rate_per_min": 60}
+}
+
+
+@pytest.mark.parametrize("input_data", [BASIC_FACTORY, DIAMOND_INPUT], ids=["basic_feasible", "diamond"])
+def test_graph_solver_matches_lp(input_data):
+    """The graph-propagation solve_factory agrees with the LP on single-producer inputs."""
+    expected = solve_factory_simplex(input_data, make_cbc_solver())
+    result = solve_factory(input_data)
+    
+    assert result["status"] == "ok"
+    # Its per-recipe figures are output rates (crafts x productivity), so
+    # only machine counts and raw use are directly comparable
+    for key in ("per_machine_counts", "raw_consumption_per_min"):
+        assert result[key] == pytest.approx(expected[key], rel=1e-6), key
+
+
+def test_graph_solver_infeasible():
+    """solve_factory bisects to the max feasible target when raw supply runs out."""
+    result = solve_factory(INFEASIBLE_RAW_FACTORY)
+    
+    assert result["status"] == "infeasible"
+    assert abs(result["max_feasible_target_per_min"] - 50.0) < 0.01
+
+
+def test_solver_cache():
+    """FactorySolver's LRU cache: hits match, are independent copies, and evict."""
+    solver = FactorySolver(cache_size=1)
+    first = solver.solve(BASIC_FACTORY)
+    expected = json.loads(json.dumps(first))
+    
+    # Mutating a returned result must not leak into later hits
+    first["per_machine_counts"]["chemical"] = -1
+    hit = solver.solve(BASIC_FACTORY)
+    assert hit == expected
+    assert hit is not first
+    hit["status"] = "changed"
+    assert solver.solve(BASIC_FACTORY) == expected
+    
+    # A second distinct input pushes the first out of a one-entry cache
+    solver.solve(INFEASIBLE_RAW_FACTORY)
+    assert list(solver._cache) == [_cache_key(INFEASIBLE_RAW_FACTORY)]
+    assert solver.solve(BASIC_FACTORY) == expected
+    
+    # A hit makes its entry most recent, so the other one is evicted next
+    solver = FactorySolver(cache_size=2)
+    solver.solve(BASIC_FACTORY)
+    solver.solve(INFEASIBLE_RAW_FACTORY)
+    solver.solve(BASIC_FACTORY)
+    solver.solve(CHAIN_INPUT)
+    assert list(solver._cache) == [_cache_key(BASIC_FACTORY), _cache_key(CHAIN_INPUT)]
+
+
+def _cache_key(input_data):
+    """FactorySolver's cache key for input_data."""
+    return json.dumps(input_data, sort_keys=True, separators=(",", ":"))
 
 
 def test_determinism():
@@ -240,37 +374,83 @@ def test_determinism():
         "target": {"item": "product", "rate_per_min": 500}
     }
     
-    results = [run_factory(input_data) for _ in range(3)]
+    # Encode once; the subprocess modes reuse the same bytes for every run
+    payload = encode(input_data)
+    results = [run_factory(input_data, payload) for _ in range(3)]
     
-    # All results should be identical
+    # All results should be identical (dict == ignores key order, like sort_keys)
     for i in range(1, len(results)):
-        assert json.dumps(results[0], sort_keys=True) == json.dumps(results[i], sort_keys=True)
+        assert results[0] == results[i]
+
+
+def test_cli_smoke():
+    """Test main.py end to end, one-shot and in --server mode."""
+    # Ignores the env vars, so the CLI entry points are never skipped
+    args = _client.default_command()
+    payload = encode(BASIC_FACTORY)
+    
+    result = _client.run_subprocess(payload, args)
+    assert result["status"] == "ok"
     
-    print("✓ Determinism test passed")
+    replies = _client.run_server_lines([payload, payload], args)
+    assert replies == [result, result]
+
+
+def test_server_survives_bad_line():
+    """Test a malformed line gets an error record and the server keeps going."""
+    replies = _client.run_server_lines([b"not json", encode(BASIC_FACTORY)])
+    
+    assert len(replies) == 2
+    assert replies[0]["status"] == "error"
+    assert "error" in replies[0]
+    assert replies[1]["status"] == "ok"
+
 
+def _run(named_test):
+    """Run one (name, test) pair; returns (name, ok, error)."""
+    name, test = named_test
+    try:
+        test()
+        return name, True, None
+    except Exception as e:
+        return name, False, e
 
-def run_all_tests():
-    """Run all tests."""
+
+def run_all_tests(jobs=None):
+    """Run all tests.
+    
+    Tests run on a thread pool of `jobs` workers (default: CPU count);
+    jobs=1 runs them serially. Results are reported in list order.
+    """
     tests = [
-        test_basic_feasible,
-        test_infeasible_raw_supply,
-        test_infeasible_machine_cap,
-        test_no_modules,
-        test_chain_production,
-        test_determinism
+        (name, lambda input_data=input_data, check=check: test_case(input_data, check))
+        for name, input_data, check in CASES
     ]
+    tests.append(("determinism", test_determinism))
+    tests.append(("cli_smoke", test_cli_smoke))
+    tests.append(("server_survives_bad_line", test_server_survives_bad_line))
     
     print("Running factory tests...\n")
     
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    jobs = max(1, min(jobs, len(tests)))
+    
+    if jobs == 1:
+        results = [_run(test) for test in tests]
+    else:
+        with ThreadPoolExecutor(max_workers=jobs) as ex:
+            results = list(ex.map(_run, tests))
+    
     passed = 0
     failed = 0
     
-    for test in tests:
-        try:
-            test()
+    for name, ok, error in results:
+        if ok:
+            print(f"✓ {name} passed")
             passed += 1
-        except Exception as e:
-            print(f"✗ {test.__name__} failed: {e}")
+        else:
+            print(f"✗ {name} failed: {error}")
             failed += 1
     
     print(f"\n{passed} passed, {failed} failed")
@@ -278,6 +458,12 @@ def run_all_tests():
 
 
 if __name__ == "__main__":
-    success = run_all_tests()
+    parser = argparse.ArgumentParser(description="Run the factory tests.")
+    parser.add_argument("--jobs", "-j", type=int, default=None,
+                        help="number of tests to run concurrently (default: CPU count)")
+    parser.add_argument("--serial", action="store_true",
+                        help="run tests one at a time, for debugging")
+    args = parser.parse_args()
+    
+    success = run_all_tests(jobs=1 if args.serial else args.jobs)
     sys.exit(0 if success else 1)
-
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the shared test-harness client in tool_client.py.
+Run with: pytest tests/test_tool_client.py -v
+"""
+
+import os
+import shlex
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Make tool_client importable when pytest is run from any directory
+sys.path.insert(0, ROOT)
+
+from tool_client import ToolClient
+
+# Stand-in --server: echoes each line back, except that "hang" never gets a
+# reply and the process ignores stdin closing
+FAKE_SERVER = (
+    "import sys, time\n"
+    "for line in sys.stdin:\n"
+    "    if line.strip() == 'hang':\n"
+    "        time.sleep(60)\n"
+    "    sys.stdout.write(line)\n"
+    "    sys.stdout.flush()\n"
+    "time.sleep(60)\n"
+)
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    script = tmp_path / "fake_server.py"
+    script.write_text(FAKE_SERVER)
+    monkeypatch.setenv("FAKE_CMD", shlex.join([sys.executable, str(script)]))
+    client = ToolClient("fake", timeout=0.5)
+    yield client
+    if client._server is not None:
+        client._server.kill()
+        client._server.wait()
+
+
+def test_server_reply(client):
+    """A reply within the deadline comes back decoded."""
+    assert client.run_server(b'{"status": "ok"}') == {"status": "ok"}
+
+
+def test_server_hang_is_killed(client):
+    """A hung request fails after the deadline, and the next call gets a fresh server."""
+    client.run_server(b'{"status": "ok"}')
+    hung = client._server
+
+    start = time.time()
+    with pytest.raises(Exception, match="no server reply within 0.5s"):
+        client.run_server(b"hang")
+    assert time.time() - start < 5
+    assert hung.poll() is not None
+
+    assert client.run_server(b'{"status": "ok"}') == {"status": "ok"}
+    assert client._server is not hung
+
+
+def test_stop_kills_stuck_server(client):
+    """stop() kills a server that doesn't exit when its stdin closes."""
+    client.run_server(b'{"status": "ok"}')
+    server = client._server
+
+    client.stop()
+    assert server.poll() is not None
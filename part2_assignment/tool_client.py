@@ -0,0 +1,186 @@
+"""
+Subprocess and --server plumbing shared by the factory and belts tests.
+
+A ToolClient drives one tool (`factory` or `belts`) out of process. It reads
+two environment variables, prefixed with the tool name upper-cased:
+
+- {PREFIX}_CMD: command to run instead of `python <tool>/main.py`
+- {PREFIX}_TEST_SERVER=1: send problems to one long-lived `--server`
+  process instead of starting a process per problem
+
+Problems and replies travel as JSON bytes (orjson when it is installed).
+"""
+
+import atexit
+import json
+import os
+import queue
+import shlex
+import subprocess
+import sys
+import threading
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def encode(input_data):
+    """Serialize input_data to the bytes sent to a solver process."""
+    if orjson is not None:
+        return orjson.dumps(input_data)
+    return json.dumps(input_data).encode()
+
+
+def decode(data):
+    """Parse a solver process's JSON output bytes."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class ToolClient:
+    """Runs one tool as a subprocess or through a shared --server process.
+
+    tool is the package name (`factory`, `belts`); label prefixes error
+    messages and defaults to the capitalized tool name. The server process
+    is started on first use, shared by all threads, and stopped at exit.
+    Every run, and every server reply, must finish within timeout seconds;
+    a server that misses the deadline is killed.
+    """
+
+    def __init__(self, tool, label=None, timeout=3):
+        self.tool = tool
+        self.label = label or tool.capitalize()
+        self.prefix = tool.upper()
+        self.timeout = timeout
+        self._server = None
+        self._replies = None  # the server's stdout lines, read by a pump thread
+        self._server_lock = threading.Lock()
+        atexit.register(self.stop)
+
+    def default_command(self):
+        """The tool's own main.py under the current interpreter."""
+        return [sys.executable, os.path.join(ROOT, self.tool, "main.py")]
+
+    def env_command(self):
+        """{PREFIX}_CMD split into argv, or None when it is unset."""
+        cmd = os.environ.get(f"{self.prefix}_CMD")
+        return shlex.split(cmd) if cmd else None
+
+    def use_server(self):
+        return os.environ.get(f"{self.prefix}_TEST_SERVER") == "1"
+
+    def out_of_process(self):
+        """True when the environment asks for a subprocess or server run."""
+        return self.use_server() or self.env_command() is not None
+
+    def run(self, payload):
+        """Solve one encoded problem the way the environment asks for."""
+        if self.use_server():
+            return self.run_server(payload)
+        return self.run_subprocess(payload)
+
+    def run_subprocess(self, payload, args=None):
+        """Run args (default: {PREFIX}_CMD or main.py) once on payload."""
+        if args is None:
+            args = self.env_command() or self.default_command()
+        result = subprocess.run(
+            args,
+            input=payload,
+            capture_output=True,
+            timeout=self.timeout
+        )
+
+        if result.returncode != 0:
+            raise Exception(f"{self.label} failed: {result.stderr.decode('utf-8', 'replace')}")
+
+        return decode(result.stdout)
+
+    def run_server(self, payload):
+        """Send an encoded problem to the shared server and read its reply."""
+        with self._server_lock:
+            if self._server is None or self._server.poll() is not None:
+                self._spawn(self.env_command() or self.default_command())
+            line = self._round_trip(payload)
+            if not line:
+                # The server died or hung on this input; the next call starts a new one
+                self._server.kill()
+                self._server.wait()
+                self._server = None
+                if line is None:
+                    raise Exception(f"{self.label} failed: no server reply within {self.timeout}s")
+                raise Exception(f"{self.label} failed: solver server exited")
+
+        result = decode(line)
+        if result.get("status") == "error":
+            raise Exception(f"{self.label} failed: {result['error']}")
+        return result
+
+    def run_server_lines(self, lines, args=None):
+        """Feed lines to a fresh --server process; returns its decoded replies.
+
+        Error records are returned as-is, so callers can check them.
+        """
+        if args is None:
+            args = self.env_command() or self.default_command()
+        result = subprocess.run(
+            args + ["--server"],
+            input=b"".join(line + b"\n" for line in lines),
+            capture_output=True,
+            timeout=self.timeout
+        )
+
+        if result.returncode != 0:
+            raise Exception(f"{self.label} failed: {result.stderr.decode('utf-8', 'replace')}")
+
+        return [decode(line) for line in result.stdout.splitlines()]
+
+    def stop(self):
+        """Close the server's stdin and wait for it to exit, killing it if it won't."""
+        if self._server is not None and self._server.poll() is None:
+            self._server.stdin.close()
+            try:
+                self._server.wait(timeout=self.timeout)
+            except subprocess.TimeoutExpired:
+                self._server.kill()
+                self._server.wait()
+
+    def _spawn(self, args):
+        """Start a solver process in --server mode, with a thread queueing its replies."""
+        self._server = subprocess.Popen(
+            args + ["--server"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE
+        )
+        self._replies = queue.Queue()
+        threading.Thread(
+            target=self._pump,
+            args=(self._server.stdout, self._replies),
+            daemon=True
+        ).start()
+
+    @staticmethod
+    def _pump(stdout, replies):
+        """Queue each line the server writes; b"" marks its exit."""
+        for line in stdout:
+            replies.put(line)
+        replies.put(b"")
+
+    def _round_trip(self, payload):
+        """Send one problem line to the server; returns its reply line.
+
+        Returns b"" if the server died and None if no reply came in time.
+        """
+        try:
+            self._server.stdin.write(payload + b"\n")
+            self._server.stdin.flush()
+        except OSError:
+            return b""
+        try:
+            return self._replies.get(timeout=self.timeout)
+        except queue.Empty:
+            return None